@@ -0,0 +1,95 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+# This is what the Assembler wrapper runs, with "python3 -S" so that nothing
+# but the few modules below is loaded. If an assembler daemon (Main.py
+# --serve) is listening on the socket, the command line is sent to it and
+# its output is replayed, otherwise the assembler runs in this process.
+import json
+import os
+import socket
+import stat
+import sys
+import typing
+
+
+def default_socket_path() -> str:
+    """Returns the path of the daemon's Unix socket, the ASSEMBLER_SOCKET
+    environment variable if it is set, otherwise one socket per user, in the
+    user's private XDG_RUNTIME_DIR if there is one"""
+    if os.environ.get("ASSEMBLER_SOCKET"):
+        return os.environ["ASSEMBLER_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"],
+                            "hack-assembler.sock")
+    return "/tmp/hack-assembler-%d.sock" % os.getuid()
+
+
+def owned_by_user(socket_path: str) -> bool:
+    """Returns True if socket_path is a socket of the current user, and not
+    for example one another user created first in a shared directory"""
+    try:
+        status = os.lstat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(status.st_mode) and status.st_uid == os.getuid()
+
+
+def request(message: typing.Dict[str, typing.Any],
+            socket_path: typing.Optional[str] = None
+            ) -> typing.Dict[str, typing.Any]:
+    """Sends a request to the daemon and returns its response. Raises
+    OSError if no daemon is listening on the socket, or if the socket does
+    not belong to the current user.
+
+    Args:
+        message (typing.Dict[str, typing.Any]): the request, see
+            AssemblerServer.handle.
+        socket_path (typing.Optional[str]): the daemon's socket, the default
+            one if this is not given.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the response of the daemon.
+    """
+    socket_path = socket_path or default_socket_path()
+    if not owned_by_user(socket_path):
+        raise PermissionError("%s is not a socket of the current user"
+                              % socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile('rb') as response:
+            line: bytes = response.readline()
+    if not line:
+        raise ConnectionError("the assembler daemon closed the connection")
+    return json.loads(line)
+
+
+def main(argv: typing.List[str]) -> int:
+    """This func runs the assembler command line through the daemon, or in
+    this process if no daemon is running. Returns the exit code"""
+    if os.path.lexists(default_socket_path()):
+        try:
+            response = request({"argv": argv, "cwd": os.getcwd()})
+        except OSError:
+            pass  # a stale socket, the daemon is gone, or not ours
+        else:
+            if not response.get("ok", True):
+                print("Assembler: error: %s" % response["error"],
+                      file=sys.stderr)
+                return 1
+            sys.stdout.write(response["stdout"])
+            sys.stderr.write(response["stderr"])
+            return response["exit_code"]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from Main import main as assemble_in_process
+    return assemble_in_process(argv)
+
+
+if "__main__" == __name__:
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,149 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import traceback
+import typing
+import Main
+from AssemblerClient import owned_by_user, request
+
+
+def _run_command_line(argv: typing.List[str],
+                      cwd: str) -> typing.Dict[str, typing.Any]:
+    """This func runs the assembler command line in the given directory and
+    returns its exit code and everything it printed. An error is printed to
+    the captured stderr, with exit code 1, like the assembler does when it
+    runs in a process of its own"""
+    if "--serve" in argv:
+        return {"exit_code": 2, "stdout": "",
+                "stderr": "Assembler: error: --serve is not allowed in a "
+                          "request to the daemon\n"}
+    stdout, stderr = io.StringIO(), io.StringIO()
+    previous_cwd: str = os.getcwd()
+    try:
+        os.chdir(cwd)
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            try:
+                exit_code = Main.main(argv)
+            except SystemExit as error:  # raised by argparse
+                exit_code = error.code if isinstance(error.code, int) else 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        os.chdir(previous_cwd)
+    return {"exit_code": exit_code, "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue()}
+
+
+def handle(message: typing.Dict[str, typing.Any]
+           ) -> typing.Dict[str, typing.Any]:
+    """Serves a single request. A request is one of:
+    - {"argv": [...], "cwd": DIR}: runs the assembler command line in DIR,
+      returns {"exit_code": N, "stdout": TEXT, "stderr": TEXT}.
+    - {"path": PATH, "options": {...}}: calls Main.assemble_path on the .asm
+      file at the absolute PATH with the given options, returns
+      {"ok": true, "seconds": S, "cached": B, "stats": {...}}.
+    - {"source": TEXT, "options": {...}}: calls Main.assemble on the source
+      with the given options, returns {"ok": true, "hack": TEXT}.
+    - {"ping": true}: returns {"ok": true}.
+    - {"shutdown": true}: stops the daemon, returns {"ok": true}.
+    A request which fails returns {"ok": false, "error": MESSAGE}.
+
+    Args:
+        message (typing.Dict[str, typing.Any]): the request.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the response.
+    """
+    try:
+        if "argv" in message:
+            return _run_command_line(message["argv"], message["cwd"])
+        options: typing.Dict[str, typing.Any] = message.get("options", {})
+        if "path" in message:
+            if not os.path.isabs(message["path"]):
+                raise ValueError("the path must be absolute")
+            result: Main.AssemblyResult = Main.assemble_path(
+                message["path"], **options)
+            return {"ok": True, "seconds": result.seconds,
+                    "cached": result.cached, "stats": result.stats}
+        if "source" in message:
+            words, symbol_table, source_lines = Main.assemble(
+                message["source"], **options)
+            hack = io.StringIO()
+            Main.write_hack(words, hack)
+            return {"ok": True, "hack": hack.getvalue()}
+        if message.get("ping") or message.get("shutdown"):
+            return {"ok": True}
+        raise ValueError("unknown request")
+    except Exception as error:
+        return {"ok": False,
+                "error": "%s: %s" % (type(error).__name__, error)}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request line from the connection and writes one JSON
+    response line back."""
+
+    def handle(self) -> None:
+        try:
+            message = json.loads(self.rfile.readline())
+        except ValueError as error:
+            response = {"ok": False, "error": "malformed request: %s" % error}
+            message = {}
+        else:
+            response = handle(message)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        if message.get("shutdown"):
+            self.server.stopping = True
+
+
+def serve(socket_path: str) -> None:
+    """Runs the assembler daemon on the given Unix socket until it is asked
+    to shut down, or interrupted. The modules, code tables and predefined
+    symbols stay loaded between requests, which are served one at a time.
+
+    Args:
+        socket_path (str): the path of the socket to listen on.
+    """
+    if os.path.lexists(socket_path):
+        if not owned_by_user(socket_path):
+            sys.exit("Assembler: %s belongs to another user, set "
+                     "ASSEMBLER_SOCKET to another path" % socket_path)
+        try:
+            request({"ping": True}, socket_path)
+        except OSError:
+            os.unlink(socket_path)  # left behind by a daemon which died
+        else:
+            sys.exit("Assembler: a daemon is already listening on %s"
+                     % socket_path)
+    # stop cleanly, removing the socket, when killed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # only the owner may connect, whatever the umask, as the daemon runs
+    # every request with the owner's permissions
+    previous_umask: int = os.umask(0o077)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+    finally:
+        os.umask(previous_umask)
+    with server:
+        server.stopping = False
+        print("Assembler: serving on %s" % socket_path, file=sys.stderr)
+        try:
+            while not server.stopping:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
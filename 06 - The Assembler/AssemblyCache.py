@@ -0,0 +1,116 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import json
+import os
+import shutil
+import typing
+
+
+class AssemblyCache:
+    """
+    A directory of previously assembled outputs. Every entry is keyed by a
+    hash of the source text, the assembler version and the options that
+    affect the output, and holds a copy of each output file of the
+    assembly together with a small metadata file.
+    """
+
+    def __init__(self, cache_dir: str, version: str) -> None:
+        """Opens the cache directory, creating it if it does not exist.
+
+        Args:
+            cache_dir (str): the directory the entries are kept in.
+            version (str): the assembler version, part of every key.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self._cache_dir: str = cache_dir
+        self._version: str = version
+
+    def key(self, source: bytes, variant: str) -> str:
+        """
+        Args:
+            source (bytes): the contents of the source file.
+            variant (str): the options that affect the output.
+
+        Returns:
+            str: the key of the entry for this source and options.
+        """
+        digest = hashlib.sha256()
+        digest.update(self._version.encode() + b"\0")
+        digest.update(variant.encode() + b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, output_path: str) -> str:
+        """Returns the path in which the entry keeps its copy of output_path"""
+        extension: str = os.path.splitext(output_path)[1]
+        return os.path.join(self._cache_dir, key + extension)
+
+    def restore(self, key: str,
+                output_paths: typing.List[str]) -> typing.Optional[float]:
+        """Restores the outputs of a cached assembly. Outputs which already
+        hold the cached contents are left untouched.
+
+        Args:
+            key (str): the key of the entry.
+            output_paths (typing.List[str]): the output files to restore.
+
+        Returns:
+            typing.Optional[float]: None if there is no such entry, otherwise
+            the time the original assembly took, in seconds.
+        """
+        try:
+            with open(os.path.join(self._cache_dir, key + ".json")) as meta:
+                seconds: float = json.load(meta)["seconds"]
+        except (OSError, ValueError, KeyError):
+            return None
+        entry_paths = [self._entry_path(key, output_path)
+                       for output_path in output_paths]
+        if not all(os.path.exists(entry_path) for entry_path in entry_paths):
+            return None
+        for entry_path, output_path in zip(entry_paths, output_paths):
+            if not _same_contents(entry_path, output_path):
+                _atomic_copy(entry_path, output_path)
+        return seconds
+
+    def store(self, key: str, output_paths: typing.List[str],
+              seconds: float) -> None:
+        """Adds the outputs of an assembly to the cache.
+
+        Args:
+            key (str): the key of the entry.
+            output_paths (typing.List[str]): the output files to keep.
+            seconds (float): the time the assembly took, in seconds.
+        """
+        for output_path in output_paths:
+            _atomic_copy(output_path, self._entry_path(key, output_path))
+        # the metadata is written last, so a partially written entry is
+        # never seen as a hit
+        meta_path: str = os.path.join(self._cache_dir, key + ".json")
+        with open(meta_path + ".tmp%d" % os.getpid(), 'w') as meta:
+            json.dump({"seconds": seconds}, meta)
+        os.replace(meta_path + ".tmp%d" % os.getpid(), meta_path)
+
+
+def _same_contents(first_path: str, second_path: str) -> bool:
+    """Do both files exist and hold the same bytes?"""
+    try:
+        if os.path.getsize(first_path) != os.path.getsize(second_path):
+            return False
+        with open(first_path, 'rb') as first, open(second_path, 'rb') as second:
+            return first.read() == second.read()
+    except OSError:
+        return False
+
+
+def _atomic_copy(source_path: str, destination_path: str) -> None:
+    """Copies a file so that readers never see it half written, even when
+    several processes write the same destination"""
+    temp_path: str = destination_path + ".tmp%d" % os.getpid()
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, destination_path)
@@ -5,97 +5,223 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+from array import array
 from typing import *
+from Parser import Instruction
+
+# The tables below map every mnemonic to its bit field already shifted into
+# its place in the 16-bit instruction word, so a C-command is encoded by
+# or-ing one entry of each table together.
+C_COMMAND_PREFIX: int = 0b111 << 13
+M_BIT: int = 1 << 12  # the "a" bit, selects M instead of A as ALU input
+# The extended shift commands use the 101 prefix instead of 111. Their bit
+# 11 selects a left shift, and bit 10 selects D as the shifted register
+# (together with M_BIT, which selects M).
+EXTENDED_PREFIX: int = 0b101 << 13
+LEFT_SHIFT_BIT: int = 1 << 11
+D_SHIFT_BIT: int = 1 << 10
+PREFIX_MASK: int = 0b111 << 13
+# the bits of a word which hold the dest and jump fields
+DEST_JUMP_MASK: int = 0b111111
+
+DEST_TABLE: Dict[str, int] = {
+    "null": 0b000 << 3,
+    "M": 0b001 << 3,
+    "D": 0b010 << 3,
+    "MD": 0b011 << 3,
+    "A": 0b100 << 3,
+    "AM": 0b101 << 3,
+    "AD": 0b110 << 3,
+    "AMD": 0b111 << 3
+}
+
+ALU_COMP_TABLE: Dict[str, int] = {
+    "0": C_COMMAND_PREFIX | 0b101010 << 6,
+    "1": C_COMMAND_PREFIX | 0b111111 << 6,
+    "-1": C_COMMAND_PREFIX | 0b111010 << 6,
+    "D": C_COMMAND_PREFIX | 0b001100 << 6,
+    "A": C_COMMAND_PREFIX | 0b110000 << 6,
+    "!D": C_COMMAND_PREFIX | 0b001101 << 6,
+    "!A": C_COMMAND_PREFIX | 0b110001 << 6,
+    "-D": C_COMMAND_PREFIX | 0b001111 << 6,
+    "-A": C_COMMAND_PREFIX | 0b110011 << 6,
+    "D+1": C_COMMAND_PREFIX | 0b011111 << 6,
+    "A+1": C_COMMAND_PREFIX | 0b110111 << 6,
+    "D-1": C_COMMAND_PREFIX | 0b001110 << 6,
+    "A-1": C_COMMAND_PREFIX | 0b110010 << 6,
+    "D+A": C_COMMAND_PREFIX | 0b000010 << 6,
+    "D-A": C_COMMAND_PREFIX | 0b010011 << 6,
+    "A-D": C_COMMAND_PREFIX | 0b000111 << 6,
+    "D&A": C_COMMAND_PREFIX | 0b000000 << 6,
+    "D|A": C_COMMAND_PREFIX | 0b010101 << 6,
+    "M": C_COMMAND_PREFIX | M_BIT | 0b110000 << 6,
+    "!M": C_COMMAND_PREFIX | M_BIT | 0b110001 << 6,
+    "-M": C_COMMAND_PREFIX | M_BIT | 0b110011 << 6,
+    "M+1": C_COMMAND_PREFIX | M_BIT | 0b110111 << 6,
+    "M-1": C_COMMAND_PREFIX | M_BIT | 0b110010 << 6,
+    "D+M": C_COMMAND_PREFIX | M_BIT | 0b000010 << 6,
+    "D-M": C_COMMAND_PREFIX | M_BIT | 0b010011 << 6,
+    "M-D": C_COMMAND_PREFIX | M_BIT | 0b000111 << 6,
+    "D&M": C_COMMAND_PREFIX | M_BIT | 0b000000 << 6,
+    "D|M": C_COMMAND_PREFIX | M_BIT | 0b010101 << 6,
+    # commutative spellings of the above, as emitted by the VM translator
+    "A+D": C_COMMAND_PREFIX | 0b000010 << 6,
+    "A&D": C_COMMAND_PREFIX | 0b000000 << 6,
+    "A|D": C_COMMAND_PREFIX | 0b010101 << 6,
+    "M+D": C_COMMAND_PREFIX | M_BIT | 0b000010 << 6,
+    "M&D": C_COMMAND_PREFIX | M_BIT | 0b000000 << 6,
+    "M|D": C_COMMAND_PREFIX | M_BIT | 0b010101 << 6
+}
+
+# The extended shift commands, as full 16-bit opcodes without their dest and
+# jump fields. They are encoded through the same tables and cache as the ALU
+# commands.
+EXTENDED_COMP_TABLE: Dict[str, int] = {
+    "A<<": 0b1010100000000000,
+    "D<<": 0b1010110000000000,
+    "M<<": 0b1011100000000000,
+    "A>>": 0b1010000000000000,
+    "D>>": 0b1010010000000000,
+    "M>>": 0b1011000000000000
+}
+
+COMP_TABLE: Dict[str, int] = {**ALU_COMP_TABLE, **EXTENDED_COMP_TABLE}
+
+JUMP_TABLE: Dict[str, int] = {
+    "null": 0b000,
+    "JGT": 0b001,
+    "JEQ": 0b010,
+    "JGE": 0b011,
+    "JLT": 0b100,
+    "JNE": 0b101,
+    "JLE": 0b110,
+    "JMP": 0b111
+}
+
+
+def _validate_tables() -> None:
+    """This func checks once, when the module is loaded, that every comp
+    opcode leaves the dest and jump fields free and carries the prefix, "a"
+    bit and shift bits its mnemonic calls for, and that no two mnemonics
+    share an opcode unless they are commutative spellings of each other"""
+    for mnemonic, word in COMP_TABLE.items():
+        if word & DEST_JUMP_MASK:
+            raise ValueError("comp %s overlaps the dest/jump fields" % mnemonic)
+        if ('M' in mnemonic) != bool(word & M_BIT):
+            raise ValueError("comp %s has a wrong \"a\" bit" % mnemonic)
+    for mnemonic, word in ALU_COMP_TABLE.items():
+        if word & PREFIX_MASK != C_COMMAND_PREFIX:
+            raise ValueError("comp %s lacks the 111 prefix" % mnemonic)
+    for mnemonic, word in EXTENDED_COMP_TABLE.items():
+        register, operator = mnemonic[0], mnemonic[1:]
+        if word & PREFIX_MASK != EXTENDED_PREFIX or \
+                operator not in ("<<", ">>") or \
+                (operator == "<<") != bool(word & LEFT_SHIFT_BIT) or \
+                (register == 'D') != bool(word & D_SHIFT_BIT) or \
+                word & ~(PREFIX_MASK | M_BIT | LEFT_SHIFT_BIT | D_SHIFT_BIT):
+            raise ValueError("malformed extended comp %s" % mnemonic)
+    mnemonics_of: Dict[int, Set[str]] = {}
+    for mnemonic, word in COMP_TABLE.items():
+        mnemonics_of.setdefault(word, set()).add(mnemonic)
+    for word, mnemonics in mnemonics_of.items():
+        if len({''.join(sorted(mnemonic)) for mnemonic in mnemonics}) > 1:
+            raise ValueError("comps %s share the opcode %s" % (
+                ", ".join(sorted(mnemonics)), format(word, '016b')))
+
+
+_validate_tables()
+
+
+def count_instructions(words: array) -> Dict[str, int]:
+    """
+    Args:
+        words (array): machine words, array('H').
+
+    Returns:
+        Dict[str, int]: the number of A-commands ("a_commands"), ALU
+        C-commands ("alu_commands") and extended shift commands
+        ("shift_commands") among the words.
+    """
+    prefixes: List[int] = [0] * 8
+    for word in words:
+        prefixes[word >> 13] += 1
+    return {"a_commands": sum(prefixes[:4]),
+            "alu_commands": prefixes[C_COMMAND_PREFIX >> 13],
+            "shift_commands": prefixes[EXTENDED_PREFIX >> 13]}
 
 
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
 
     @staticmethod
-    def dest(mnemonic: str) -> str:
+    def dest(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a dest mnemonic string.
 
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: the 3 dest bits of the given mnemonic, shifted into place.
         """
-        dest_table: Dict[str, str] = {
-            "null": "000",
-            "M": "001",
-            "D": "010",
-            "MD": "011",
-            "A": "100",
-            "AM": "101",
-            "AD": "110",
-            "AMD": "111"
-        }
-        return dest_table[mnemonic]
+        return DEST_TABLE[mnemonic]
 
     @staticmethod
-    def comp(mnemonic: str) -> str:
+    def comp(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a comp mnemonic string.
 
         Returns:
-            str: the binary code of the given mnemonic.
+            int: the prefix, "a" and comp bits of the given mnemonic, shifted
+            into place.
         """
-        comp_table: Dict[str, str] = {
-            "0": "101010",
-            "1": "111111",
-            "-1": "111010",
-            "D": "001100",
-            "A": "110000",
-            "!D": "001101",
-            "!A": "110001",
-            "-D": "001111",
-            "-A": "110011",
-            "D+1": "011111",
-            "A+1": "110111",
-            "D-1": "001110",
-            "A-1": "110010",
-            "D+A": "000010",
-            "D-A": "010011",
-            "A-D": "000111",
-            "D&A": "000000",
-            "D|A": "010101",
-            "M": "110000",
-            "!M": "110001",
-            "-M": "110011",
-            "M+1": "110111",
-            "M-1": "110010",
-            "D+M": "000010",
-            "D-M": "010011",
-            "M-D": "000111",
-            "D&M": "000000",
-            "D|M": "010101",
-            "A<<": "1010100000",
-            "D<<": "1010110000",
-            "M<<": "1011100000",
-            "A>>": "1010000000",
-            "D>>": "1010010000",
-            "M>>": "1011000000"
-        }
-        return comp_table[mnemonic]
+        return COMP_TABLE[mnemonic]
 
     @staticmethod
-    def jump(mnemonic: str) -> str:
+    def jump(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a jump mnemonic string.
 
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: the 3 jump bits of the given mnemonic.
+        """
+        return JUMP_TABLE[mnemonic]
+
+
+class EncodingCache:
+    """
+    Memoises the encoding of C-commands for a single assembly run. Generated
+    code repeats the same few C-commands (M=D, AM=M-1, D=M, 0;JMP, ...) over
+    and over, so the finished word is kept per cleaned command text and
+    repeated commands are encoded with a single dictionary lookup.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty cache."""
+        self._words: Dict[str, int] = {}
+        self.lookups: int = 0
+
+    def encode(self, instruction: Instruction) -> int:
+        """
+        Args:
+            instruction (Instruction): a decoded C-command.
+
+        Returns:
+            int: the 16-bit machine word of the command.
+        """
+        self.lookups += 1
+        try:
+            return self._words[instruction.text]
+        except KeyError:
+            word: int = (Code.comp(instruction.comp) |
+                         Code.dest(instruction.dest) |
+                         Code.jump(instruction.jump))
+            self._words[instruction.text] = word
+            return word
+
+    def hits(self) -> int:
+        """
+        Returns:
+            int: how many lookups were served from the cache.
         """
-        jump_table: Dict[str, str] = {
-            "null": "000",
-            "JGT": "001",
-            "JEQ": "010",
-            "JGE": "011",
-            "JLT": "100",
-            "JNE": "101",
-            "JLE": "110",
-            "JMP": "111"
-        }
-        return jump_table[mnemonic]
+        return self.lookups - len(self._words)
@@ -0,0 +1,74 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import struct
+import sys
+import typing
+import zlib
+from array import array
+
+# A .hackb image is a 12 byte header followed by the machine words, each one
+# stored as a little-endian unsigned 16-bit integer:
+#   bytes 0-3   magic, b"HKB1"
+#   bytes 4-7   number of words in the image (uint32, little-endian)
+#   bytes 8-11  CRC-32 of the words section (uint32, little-endian)
+# The header size is a multiple of 2, so the whole file may also be read as
+# one uint16 array and sliced, e.g. numpy.fromfile(path, "<u2")[6:].
+HACKB_MAGIC: bytes = b"HKB1"
+HACKB_HEADER: struct.Struct = struct.Struct("<4sII")
+HACKB_HEADER_SIZE: int = HACKB_HEADER.size
+
+
+def words_to_bytes(words: array) -> bytes:
+    """This func returns the little-endian byte representation of the given
+    array('H') of machine words"""
+    if sys.byteorder == "little":
+        return words.tobytes()
+    swapped: array = array('H', words)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def write_hackb(words: array, output_file: typing.BinaryIO) -> None:
+    """Writes the machine words into output file as a .hackb image.
+
+    Args:
+        words (array): the machine words of the program, array('H').
+        output_file (typing.BinaryIO): a file opened for binary writing.
+    """
+    payload: bytes = words_to_bytes(words)
+    output_file.write(HACKB_HEADER.pack(HACKB_MAGIC, len(words),
+                                        zlib.crc32(payload)))
+    output_file.write(payload)
+
+
+def read_hackb(input_file: typing.BinaryIO) -> array:
+    """Loads a .hackb image, verifying its header and checksum.
+
+    Args:
+        input_file (typing.BinaryIO): a file opened for binary reading.
+
+    Returns:
+        array: the machine words of the program, array('H').
+    """
+    data: bytes = input_file.read()
+    if len(data) < HACKB_HEADER_SIZE:
+        raise ValueError("truncated .hackb header")
+    magic, word_count, checksum = HACKB_HEADER.unpack_from(data)
+    if magic != HACKB_MAGIC:
+        raise ValueError("not a .hackb image")
+    payload: memoryview = memoryview(data)[HACKB_HEADER_SIZE:]
+    if len(payload) != 2 * word_count:
+        raise ValueError("expected %d words, found %d bytes"
+                         % (word_count, len(payload)))
+    if zlib.crc32(payload) != checksum:
+        raise ValueError(".hackb checksum mismatch")
+    words: array = array('H')
+    words.frombytes(payload)
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words
@@ -0,0 +1,82 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import json
+import typing
+from array import array
+from SymbolTable import SymbolTable
+
+# A .map file is a JSON object which relates the assembled program back to
+# its source. Every table is stored as flat arrays sorted by address, so a
+# reader can look an address up with a binary search:
+#   "format"     the format version, HACK_MAP_FORMAT
+#   "source"     the name of the source file
+#   "lines"      the 1-based source line of every ROM address, in order
+#   "labels"     {"addresses": [...], "names": [...]}, by ROM address
+#   "variables"  {"addresses": [...], "names": [...]}, by RAM address
+HACK_MAP_FORMAT: int = 1
+
+
+def _sorted_table(entries: typing.List[typing.Tuple[str, int]]
+                  ) -> typing.Dict[str, list]:
+    """This func splits (name, address) pairs, sorted by address, into the
+    two parallel arrays of a map table"""
+    return {"addresses": [address for name, address in entries],
+            "names": [name for name, address in entries]}
+
+
+def write_map(source_name: str, source_lines: array,
+              symbol_table: SymbolTable, output_file: typing.TextIO) -> None:
+    """Writes the map of an assembled program into output file.
+
+    Args:
+        source_name (str): the name of the source file.
+        source_lines (array): the source line of every ROM address,
+            array('I'), as returned by assemble.
+        symbol_table (SymbolTable): the final symbol table of the program.
+        output_file (typing.TextIO): a file opened for writing.
+    """
+    json.dump({"format": HACK_MAP_FORMAT,
+               "source": source_name,
+               "lines": source_lines.tolist(),
+               "labels": _sorted_table(symbol_table.labels()),
+               "variables": _sorted_table(symbol_table.variables())},
+              output_file, separators=(',', ':'))
+
+
+def read_map(input_file: typing.TextIO) -> typing.Dict[str, typing.Any]:
+    """Loads a .map file, verifying its format version.
+
+    Args:
+        input_file (typing.TextIO): a file opened for reading.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the map, as described above.
+    """
+    hack_map: typing.Dict[str, typing.Any] = json.load(input_file)
+    if hack_map.get("format") != HACK_MAP_FORMAT:
+        raise ValueError("unsupported map format: %r"
+                         % hack_map.get("format"))
+    return hack_map
+
+
+def label_at(hack_map: typing.Dict[str, typing.Any],
+             address: int) -> typing.Optional[str]:
+    """
+    Args:
+        hack_map (typing.Dict[str, typing.Any]): a map, as read by read_map.
+        address (int): a ROM address.
+
+    Returns:
+        typing.Optional[str]: the closest label at or before the address,
+        for example the function the address belongs to, or None if there
+        is no such label.
+    """
+    labels: typing.Dict[str, list] = hack_map["labels"]
+    index: int = bisect.bisect_right(labels["addresses"], address) - 1
+    return labels["names"][index] if index >= 0 else None
@@ -0,0 +1,68 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import typing
+from array import array
+
+# A .hacko file is a relocatable object module, the output of assembling a
+# single unit of a program. It is a JSON object:
+#   "format"       the format version, HACK_OBJECT_FORMAT
+#   "source"       the name of the source file
+#   "code"         the machine words, as if the unit started at ROM address 0
+#   "relocations"  the sorted addresses of the words which hold the address
+#                  of a label of the unit, the linker adds the unit's base
+#                  address to them
+#   "exports"      {label: address in the unit} for every label of the unit
+#   "imports"      {symbol: [addresses]} for every symbol the unit uses but
+#                  does not define, in order of first use. The words at these
+#                  addresses hold 0, the linker patches them with the address
+#                  of a label exported by another unit, or else of a variable
+# Numbers and predefined symbols (R0-R15, SP, SCREEN, ...) are absolute and
+# are already encoded in the code.
+HACK_OBJECT_FORMAT: int = 1
+
+
+class HackObject(typing.NamedTuple):
+    """A relocatable object module, as described above."""
+    source: str
+    code: array  # array('H')
+    relocations: typing.List[int]
+    exports: typing.Dict[str, int]
+    imports: typing.Dict[str, typing.List[int]]
+
+
+def write_object(hack_object: HackObject, output_file: typing.TextIO) -> None:
+    """Writes an object module into output file as a .hacko file.
+
+    Args:
+        hack_object (HackObject): the object module.
+        output_file (typing.TextIO): a file opened for writing.
+    """
+    json.dump({"format": HACK_OBJECT_FORMAT,
+               "source": hack_object.source,
+               "code": hack_object.code.tolist(),
+               "relocations": hack_object.relocations,
+               "exports": hack_object.exports,
+               "imports": hack_object.imports},
+              output_file, separators=(',', ':'))
+
+
+def read_object(input_file: typing.TextIO) -> HackObject:
+    """Loads a .hacko file, verifying its format version.
+
+    Args:
+        input_file (typing.TextIO): a file opened for reading.
+
+    Returns:
+        HackObject: the object module.
+    """
+    data: typing.Dict[str, typing.Any] = json.load(input_file)
+    if data.get("format") != HACK_OBJECT_FORMAT:
+        raise ValueError("unsupported object format: %r" % data.get("format"))
+    return HackObject(data["source"], array('H', data["code"]),
+                      data["relocations"], data["exports"], data["imports"])
@@ -0,0 +1,106 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import typing
+from array import array
+from SymbolTable import SymbolTable
+from HackBinary import write_hackb
+from HackObject import HackObject, read_object
+from Main import ROM_SIZE, write_hack
+
+
+def link(objects: typing.List[HackObject]
+         ) -> typing.Tuple[array, SymbolTable]:
+    """Combines object modules into a single program. The modules are placed
+    in ROM one after the other, in the given order, the labels of every
+    module are moved to its base address, and the imports of every module
+    are resolved to the labels exported by the other modules. Imports which
+    no module exports are variables, and are allocated from address 16 in
+    order of first use, exactly like the assembler does for a single file.
+    Linking the units of a program therefore gives the same words as
+    assembling their concatenation, as long as no label is defined by more
+    than one unit. Such a label stays private to every unit defining it,
+    where the concatenation would bind all its uses to the first one.
+
+    Args:
+        objects (typing.List[HackObject]): the modules, in link order.
+
+    Returns:
+        typing.Tuple[array, SymbolTable]: the machine words of the program as
+        array('H'), and its symbol table.
+    """
+    symbol_table: SymbolTable = SymbolTable()
+    bases: typing.List[int] = []
+    # the modules which define every label, a label may be defined by more
+    # than one module as long as no other module imports it
+    definitions: typing.Dict[str, typing.List[str]] = {}
+    base: int = 0
+    for hack_object in objects:
+        bases.append(base)
+        for label, address in hack_object.exports.items():
+            if not symbol_table.contains(label):
+                symbol_table.add_entry(label, base + address)
+            definitions.setdefault(label, []).append(hack_object.source)
+        base += len(hack_object.code)
+    if base > ROM_SIZE:
+        raise ValueError("the program takes %d words, the ROM holds %d"
+                         % (base, ROM_SIZE))
+
+    words: array = array('H')
+    for base, hack_object in zip(bases, objects):
+        code: array = array('H', hack_object.code)
+        for index in hack_object.relocations:
+            code[index] += base
+        words.extend(code)
+    var_counter: int = 16
+    for base, hack_object in zip(bases, objects):
+        for symbol, indices in hack_object.imports.items():
+            modules: typing.List[str] = definitions.get(symbol, [])
+            if len(modules) > 1:
+                raise ValueError("%s: %s is defined by more than one module: "
+                                 "%s" % (hack_object.source, symbol,
+                                         ", ".join(modules)))
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, var_counter, variable=True)
+                var_counter += 1
+            address: int = symbol_table.get_address(symbol)
+            for index in indices:
+                words[base + index] = address
+    return words, symbol_table
+
+
+if "__main__" == __name__:
+    # Parses the output path and the object modules, links the modules in the
+    # given order and writes the program as a .hack file. With --binary, a
+    # .hackb image of the program is written next to it as well.
+    arg_parser = argparse.ArgumentParser(prog="Linker")
+    arg_parser.add_argument(
+        "-o", "--output", required=True, metavar="PROGRAM.hack",
+        help="the .hack file to write")
+    arg_parser.add_argument(
+        "object_paths", nargs="+", metavar="OBJECT.hacko",
+        help="the object modules, the one holding the entry point first")
+    arg_parser.add_argument(
+        "--binary", action="store_true",
+        help="also write a binary .hackb image of the program")
+    args = arg_parser.parse_args()
+    objects: typing.List[HackObject] = []
+    for object_path in args.object_paths:
+        with open(object_path, 'r') as object_file:
+            objects.append(read_object(object_file))
+    try:
+        program, program_symbols = link(objects)
+    except ValueError as error:
+        arg_parser.exit(1, "Linker: error: %s\n" % error)
+    with open(args.output, 'w') as output_file:
+        write_hack(program, output_file)
+    if args.binary:
+        with open(os.path.splitext(args.output)[0] + ".hackb",
+                  'wb') as binary_file:
+            write_hackb(program, binary_file)
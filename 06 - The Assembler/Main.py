@@ -5,121 +5,658 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import hashlib
+import mmap
 import os
 import sys
+import time
 import typing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from SymbolTable import SymbolTable
-from Parser import Parser
-from Code import Code
+from Parser import Parser, Instruction
+from Code import EncodingCache, count_instructions
+from HackBinary import write_hackb
+from HackMap import write_map
+from HackObject import HackObject, write_object
+from AssemblyCache import AssemblyCache
+from AssemblerClient import default_socket_path
+from Optimizer import eliminate_unreachable, peephole, PEEPHOLE_RULES
+
+
+def source_digest(directory: str) -> str:
+    """This func returns a hash of the Python sources in the directory, which
+    changes with every change to the assembler's modules"""
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".py"):
+            with open(os.path.join(directory, filename), 'rb') as source:
+                digest.update(filename.encode() + b"\0")
+                digest.update(source.read() + b"\0")
+    return digest.hexdigest()[:16]
+
+
+# Part of every assembly cache key. It ends with a hash of the assembler's
+# sources, so outputs cached by any other version of the code are never
+# restored.
+ASSEMBLER_VERSION: str = "2.0+" + source_digest(
+    os.path.dirname(os.path.abspath(__file__)))
+
+# The number of machine words write_hack formats and writes at a time.
+WRITE_BLOCK_WORDS: int = 1 << 16
+
+# The number of words in the Hack ROM, every label address is below it.
+ROM_SIZE: int = 32768
+
+
+def check_rom_size(words: array) -> None:
+    """This func raises ValueError if the program does not fit in the ROM"""
+    if len(words) > ROM_SIZE:
+        raise ValueError("the program takes %d words, the ROM holds %d"
+                         % (len(words), ROM_SIZE))
 
 
 def first_pass(symbol_table: SymbolTable, parser: Parser) -> None:
     """This func receive a parser and a symbol table and insert into the table
     all the labels in the file"""
     line_counter: int = -1
-    while parser.has_more_commands():
-        parser.advance()
-        if not parser.has_more_commands():
-            break
-        c_type: str = parser.command_type()
-        if c_type == "L_COMMAND":
-            symbol: str = parser.symbol()
+    for instruction in parser.instructions:
+        if instruction.kind == "L_COMMAND":
+            symbol: str = instruction.symbol
             if not symbol_table.contains(symbol):
                 symbol_table.add_entry(symbol, line_counter + 1)
         else:
             line_counter += 1
-    parser.reset_line_counter()
-
-
-def to_16bit(binary_str: str) -> str:
-    """func extend the binary code string into 16 bits length"""
-    return binary_str.zfill(16)
 
 
 def second_pass(symbol_table: SymbolTable, parser: Parser,
-                output_file: typing.TextIO):
+                encoding_cache: typing.Optional[EncodingCache] = None
+                ) -> array:
     """This func codes into binary code the instruction in file and also add
-    variables into the symbol table. Func write into output file the resulted
-    instructions"""
+    variables into the symbol table. Func returns the resulted instructions
+    as 16-bit machine words. C-commands are encoded through encoding_cache,
+    a fresh one is used if it is not given"""
+    encode = (encoding_cache or EncodingCache()).encode
+    words: array = array('H')
     var_counter: int = 16
-    C_BITS_SIZE: int = 6
-    C_COMMAND_START: str = "111"
-    while parser.has_more_commands():
-        parser.advance()
-        if not parser.has_more_commands():
-            break
-        c_type: str = parser.command_type()
+    for instruction in parser.instructions:
+        c_type: str = instruction.kind
         if c_type == "C_COMMAND":
-            dest: str = parser.dest()
-            comp: str = parser.comp()
-            jump: str = parser.jump()
-            c_dest: str = Code.dest(dest)
-            c_comp: str = Code.comp(comp)
-            c_jump: str = Code.jump(jump)
-            a_bit: str = '1' if 'M' in comp else '0'
-            if len(c_comp) > C_BITS_SIZE:
-                assembled: str = c_comp + c_dest + c_jump  # extended c command << >>
-            else:
-                assembled: str = C_COMMAND_START + a_bit + c_comp + c_dest + c_jump
-            output_file.write(assembled + '\n')
+            words.append(encode(instruction))
 
         elif c_type == "A_COMMAND":
-            symbol: str = parser.symbol()
+            symbol: str = instruction.symbol
             if symbol.isdigit():
                 #  the symbol is a number @Num
-                bin_code: str = bin(int(symbol))[2:]
-                bin_command: str = to_16bit(bin_code)
-                output_file.write(bin_command + '\n')
+                words.append(int(symbol))
+            elif symbol_table.contains(symbol):
+                words.append(symbol_table.get_address(symbol))
             else:
-                if symbol_table.contains(symbol):
-                    address: int = symbol_table.get_address(symbol)
-                    bin_code: str = bin(int(address))[2:]
-                    bin_command: str = to_16bit(bin_code)
-                    output_file.write(bin_command + '\n')
-                else:
-                    symbol_table.add_entry(symbol, var_counter)
-                    bin_code: str = bin(int(var_counter))[2:]
-                    bin_command: str = to_16bit(bin_code)
-                    output_file.write(bin_command + '\n')
-                    var_counter += 1
+                symbol_table.add_entry(symbol, var_counter, variable=True)
+                words.append(var_counter)
+                var_counter += 1
+    check_rom_size(words)
+    return words
+
+
+def fixup_pass(symbol_table: SymbolTable,
+               instructions: typing.Iterable[Instruction],
+               encoding_cache: typing.Optional[EncodingCache] = None
+               ) -> array:
+    """This func codes the instructions into binary code in a single
+    traversal. References to symbols which are not known yet are recorded in
+    a fixup list and patched as soon as their label is defined. Symbols which
+    are still unresolved at the end are variables, and are allocated from
+    address 16 in order of first use, exactly like second_pass does. Both
+    raise ValueError if the program does not fit in the ROM"""
+    encode = (encoding_cache or EncodingCache()).encode
+    words: array = array('H')
+    fixups: typing.Dict[str, typing.List[int]] = {}
+    for instruction in instructions:
+        c_type: str = instruction.kind
+        if c_type == "C_COMMAND":
+            words.append(encode(instruction))
+
+        elif c_type == "A_COMMAND":
+            symbol: str = instruction.symbol
+            if symbol.isdigit():
+                words.append(int(symbol))
+            elif symbol_table.contains(symbol):
+                words.append(symbol_table.get_address(symbol))
+            else:
+                # unresolved for now, patched once the symbol is known
+                fixups.setdefault(symbol, []).append(len(words))
+                words.append(0)
+
+        else:  # c_type == "L_COMMAND"
+            symbol: str = instruction.symbol
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, len(words))
+                for index in fixups.pop(symbol, ()):
+                    words[index] = len(words)
+    check_rom_size(words)
+
+    # dicts keep insertion order, so the remaining symbols are in order of
+    # first use
+    var_counter: int = 16
+    for symbol, indices in fixups.items():
+        symbol_table.add_entry(symbol, var_counter, variable=True)
+        for index in indices:
+            words[index] = var_counter
+        var_counter += 1
+    return words
+
+
+def object_pass(instructions: typing.Iterable[Instruction], source_name: str,
+                encoding_cache: typing.Optional[EncodingCache] = None
+                ) -> HackObject:
+    """This func codes the instructions of a single unit into a relocatable
+    object module, in one traversal like fixup_pass. References to the
+    unit's own labels are recorded as relocations, while symbols the unit
+    does not define are left as imports for the linker, which resolves them
+    to the labels of other units or allocates them as variables. Raises
+    ValueError if the unit alone does not fit in the ROM"""
+    encode = (encoding_cache or EncodingCache()).encode
+    predefined: SymbolTable = SymbolTable()
+    words: array = array('H')
+    labels: typing.Dict[str, int] = {}
+    relocations: typing.List[int] = []
+    fixups: typing.Dict[str, typing.List[int]] = {}
+    for instruction in instructions:
+        c_type: str = instruction.kind
+        if c_type == "C_COMMAND":
+            words.append(encode(instruction))
+
+        elif c_type == "A_COMMAND":
+            symbol: str = instruction.symbol
+            if symbol.isdigit():
+                words.append(int(symbol))
+            elif predefined.contains(symbol):
+                words.append(predefined.get_address(symbol))
+            elif symbol in labels:
+                relocations.append(len(words))
+                words.append(labels[symbol])
+            else:
+                fixups.setdefault(symbol, []).append(len(words))
+                words.append(0)
+
+        else:  # c_type == "L_COMMAND"
+            symbol: str = instruction.symbol
+            if not predefined.contains(symbol) and symbol not in labels:
+                labels[symbol] = len(words)
+                for index in fixups.pop(symbol, ()):
+                    words[index] = len(words)
+                    relocations.append(index)
+    check_rom_size(words)
+    relocations.sort()
+    return HackObject(source_name, words, relocations, labels, fixups)
+
+
+def write_hack(words: array, output_file: typing.TextIO) -> None:
+    """This func formats the machine words as 16 binary digits per line and
+    writes them into output file in large blocks, so the text of a big
+    program is never held in memory as a whole"""
+    for start in range(0, len(words), WRITE_BLOCK_WORDS):
+        output_file.write(''.join([
+            format(word, '016b') + '\n'
+            for word in words[start:start + WRITE_BLOCK_WORDS]]))
+
+
+def optimize(instructions: typing.Iterable[Instruction],
+             peephole_rules: typing.Optional[typing.Collection[str]],
+             strip_unreachable: bool,
+             stats: typing.Optional[typing.Dict[str, int]]
+             ) -> typing.List[Instruction]:
+    """This func removes the unreachable commands and then runs the peephole
+    rules over the decoded commands, as requested, and records the number of
+    ROM words each of them removed in stats"""
+    optimized: typing.List[Instruction] = list(instructions)
+    if strip_unreachable:
+        optimized, words_removed = eliminate_unreachable(optimized)
+        if stats is not None:
+            stats["unreachable"] = words_removed
+    if peephole_rules is not None:
+        optimized, removed = peephole(optimized, peephole_rules)
+        if stats is not None:
+            for rule, words_removed in removed.items():
+                stats["peephole:" + rule] = words_removed
+    return optimized
+
+
+def assemble(source: typing.Union[str, typing.Iterable[str], bytes, mmap.mmap],
+             single_pass: bool = False,
+             encoding_cache: typing.Optional[EncodingCache] = None,
+             peephole_rules: typing.Optional[typing.Collection[str]] = None,
+             strip_unreachable: bool = False,
+             stats: typing.Optional[typing.Dict[str, int]] = None
+             ) -> typing.Tuple[array, SymbolTable, array]:
+    """Assembles a program held in memory, without any file I/O.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str], bytes, mmap.mmap]):
+            the program, either as a single string, as an iterable of lines
+            (for example an open file, or the lines produced by the VM
+            translator), or as the raw bytes of the source file (for example
+            a memory map of it, which is scanned without being copied).
+        single_pass (bool): if this is True, the program is assembled in one
+            traversal with forward references backpatched, instead of the
+            two passes. The source is then consumed line by line and never
+            held in memory, neither as text nor as decoded commands. The
+            output is the same.
+        encoding_cache (typing.Optional[EncodingCache]): the cache C-commands
+            are encoded through, pass one in to read its statistics.
+        peephole_rules (typing.Optional[typing.Collection[str]]): if given,
+            these peephole rules (see Optimizer.PEEPHOLE_RULES) are applied
+            to the decoded commands before labels are resolved. This needs
+            all the decoded commands in memory, even in single pass mode.
+        strip_unreachable (bool): if this is True, the commands no jump or
+            fall-through can reach (see Optimizer.eliminate_unreachable) are
+            removed before labels are resolved, and before the peephole
+            rules run. This also needs all the decoded commands in memory.
+        stats (typing.Optional[typing.Dict[str, int]]): if given, the number
+            of ROM words each peephole rule removed is stored in it, under
+            "peephole:<rule>", and the number of unreachable ROM words
+            removed under "unreachable".
+
+    Returns:
+        typing.Tuple[array, SymbolTable, array]: the machine words as
+        array('H'), the final symbol table, and an array('I') holding for
+        every ROM address the 1-based source line it was assembled from.
+    """
+    lines: typing.Iterable[str] = (
+        source.splitlines() if isinstance(source, str) else source)
+    symbol_table: SymbolTable = SymbolTable()
+    if single_pass:
+        decoded: typing.Iterable[Instruction] = Parser.iter_instructions(lines)
+        if peephole_rules is not None or strip_unreachable:
+            decoded = optimize(decoded, peephole_rules, strip_unreachable,
+                               stats)
+        source_lines: array = array('I')
+
+        def instructions() -> typing.Iterator[Instruction]:
+            for instruction in decoded:
+                if instruction.kind != "L_COMMAND":
+                    source_lines.append(instruction.line)
+                yield instruction
+
+        words: array = fixup_pass(symbol_table, instructions(),
+                                  encoding_cache)
+    else:
+        parser: Parser = Parser(lines)
+        if peephole_rules is not None or strip_unreachable:
+            parser.set_instructions(optimize(parser.instructions,
+                                             peephole_rules,
+                                             strip_unreachable, stats))
+        first_pass(symbol_table, parser)
+        words: array = second_pass(symbol_table, parser, encoding_cache)
+        source_lines: array = array('I', [
+            instruction.line for instruction in parser.instructions
+            if instruction.kind != "L_COMMAND"])
+    return words, symbol_table, source_lines
+
+
+def assemble_object(source: typing.Union[str, typing.Iterable[str], bytes,
+                                        mmap.mmap],
+                    source_name: str,
+                    encoding_cache: typing.Optional[EncodingCache] = None,
+                    peephole_rules: typing.Optional[
+                        typing.Collection[str]] = None,
+                    stats: typing.Optional[typing.Dict[str, int]] = None
+                    ) -> HackObject:
+    """Assembles a single unit of a program, held in memory, into a
+    relocatable object module. The units are combined by Linker.link.
+
+    Args:
+        source (typing.Union[str, typing.Iterable[str], bytes, mmap.mmap]):
+            the unit, as in assemble.
+        source_name (str): the name of the source file, kept in the object.
+        encoding_cache (typing.Optional[EncodingCache]): as in assemble.
+        peephole_rules (typing.Optional[typing.Collection[str]]): as in
+            assemble.
+        stats (typing.Optional[typing.Dict[str, int]]): as in assemble.
+
+    Returns:
+        HackObject: the object module of the unit.
+    """
+    lines: typing.Iterable[str] = (
+        source.splitlines() if isinstance(source, str) else source)
+    decoded: typing.Iterable[Instruction] = Parser.iter_instructions(lines)
+    if peephole_rules is not None:
+        decoded = optimize(decoded, peephole_rules, False, stats)
+    return object_pass(decoded, source_name, encoding_cache)
 
 
 def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.Union[typing.TextIO, mmap.mmap, bytes],
+        output_file: typing.TextIO,
+        **options: typing.Any) -> typing.Tuple[array, SymbolTable, array]:
     """Assembles a single file.
 
     Args:
-        input_file (typing.TextIO): the file to assemble.
+        input_file (typing.Union[typing.TextIO, mmap.mmap, bytes]): the file
+            to assemble, or its memory map (see map_source).
         output_file (typing.TextIO): writes all output to this file.
+        options: passed on to assemble (single_pass, encoding_cache, ...).
+
+    Returns:
+        typing.Tuple[array, SymbolTable, array]: the machine words, symbol
+        table and source lines of the program, as returned by assemble.
     """
     # Your code goes here!
-    # A good place to start is to initialize a new Parser object:
-    parser: Parser = Parser(input_file)
-    symbol_table: SymbolTable = SymbolTable()
-    first_pass(symbol_table, parser)
-    second_pass(symbol_table, parser, output_file)
+    words, symbol_table, source_lines = assemble(input_file, **options)
+    write_hack(words, output_file)
+    return words, symbol_table, source_lines
 
 
-if "__main__" == __name__:
-    # Parses the input path and calls assemble_file on each input file.
+def map_source(input_file: typing.BinaryIO
+               ) -> typing.Union[mmap.mmap, bytes]:
+    """This func maps a source file opened for binary reading into memory,
+    read-only, so it can be assembled without reading it into a string.
+    Empty files can not be mapped, b"" is returned for them instead"""
+    if os.fstat(input_file.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class AssemblyResult(typing.NamedTuple):
+    """What assemble_path did for a single file."""
+    seconds: float  # the time spent on the file
+    cached: bool  # True if the outputs were restored from the cache
+    seconds_saved: float  # assembly time the cache saved
+    stats: typing.Dict[str, int]  # counters of the assembly, empty if cached
+
+
+def assemble_path(input_path: str, binary: bool = False,
+                  map_file: bool = False, single_pass: bool = False,
+                  cache_dir: typing.Optional[str] = None,
+                  peephole_rules: typing.Optional[typing.Tuple[str, ...]] = None,
+                  strip_unreachable: bool = False,
+                  object_file: bool = False,
+                  mmap_input: bool = False) -> AssemblyResult:
+    """Assembles the .asm file at input_path into a .hack file next to it.
+
+    Args:
+        input_path (str): path of the file to assemble.
+        binary (bool): if this is True, a .hackb image is written as well.
+        map_file (bool): if this is True, a .map file relating every ROM
+            address to its source line, with the label and variable tables,
+            is written as well (see HackMap).
+        single_pass (bool): passed on to assemble.
+        peephole_rules (typing.Optional[typing.Tuple[str, ...]]): passed on to
+            assemble.
+        strip_unreachable (bool): passed on to assemble.
+        object_file (bool): if this is True, the file is assembled as a
+            single unit of a program into a relocatable .hacko object module
+            (see assemble_object), which is written instead of all the other
+            outputs.
+        mmap_input (bool): if this is True, the source file is memory-mapped
+            and scanned as bytes (see map_source), instead of being read as
+            text. Together with single_pass, neither the text nor the
+            decoded commands are ever held in memory as a whole.
+        cache_dir (typing.Optional[str]): if given, the outputs are restored
+            from this assembly cache when the source did not change, and
+            stored in it otherwise.
+
+    Returns:
+        AssemblyResult: the time the file took and whether it was cached.
+    """
     # This opens both the input and the output files!
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    start: float = time.perf_counter()
+    filename, extension = os.path.splitext(input_path)
+    output_path = filename + (".hacko" if object_file else ".hack")
+    output_paths: typing.List[str] = [output_path]
+    if object_file:
+        binary = map_file = single_pass = strip_unreachable = False
+    if binary:
+        output_paths.append(filename + ".hackb")
+    if map_file:
+        output_paths.append(filename + ".map")
+    if cache_dir is not None:
+        cache: AssemblyCache = AssemblyCache(cache_dir, ASSEMBLER_VERSION)
+        with open(input_path, 'rb') as source_file:
+            key: str = cache.key(
+                source_file.read(),
+                "binary=%s map=%s object=%s peephole=%s unreachable=%s" % (
+                    binary,
+                    # the map and the object name their source file
+                    map_file and os.path.basename(input_path),
+                    object_file and os.path.basename(input_path),
+                    ",".join(peephole_rules or ()), strip_unreachable))
+        original_seconds = cache.restore(key, output_paths)
+        if original_seconds is not None:
+            seconds: float = time.perf_counter() - start
+            return AssemblyResult(seconds, True,
+                                  max(original_seconds - seconds, 0.0), {})
+    encoding_cache: EncodingCache = EncodingCache()
+    stats: typing.Dict[str, int] = {}
+    # written to a temporary file which replaces the output once the whole
+    # program is assembled, so a failure leaves no truncated output behind
+    temp_path: str = output_path + ".tmp%d" % os.getpid()
+    try:
+        with open(input_path, 'rb' if mmap_input else 'r') as input_file, \
+                open(temp_path, 'w') as output_file:
+            source = map_source(input_file) if mmap_input else input_file
+            if object_file:
+                hack_object: HackObject = assemble_object(
+                    source, os.path.basename(input_path),
+                    encoding_cache=encoding_cache,
+                    peephole_rules=peephole_rules, stats=stats)
+                write_object(hack_object, output_file)
+                words = hack_object.code
+            else:
+                words, symbol_table, source_lines = assemble_file(
+                    source, output_file, single_pass=single_pass,
+                    encoding_cache=encoding_cache,
+                    peephole_rules=peephole_rules,
+                    strip_unreachable=strip_unreachable, stats=stats)
+            if isinstance(source, mmap.mmap):
+                source.close()
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, output_path)
+    if binary:
+        with open(filename + ".hackb", 'wb') as binary_file:
+            write_hackb(words, binary_file)
+    if map_file:
+        with open(filename + ".map", 'w') as map_output:
+            write_map(os.path.basename(input_path), source_lines,
+                      symbol_table, map_output)
+    seconds: float = time.perf_counter() - start
+    if cache_dir is not None:
+        cache.store(key, output_paths, seconds)
+    stats["c_commands"] = encoding_cache.lookups
+    stats["encoding_cache_hits"] = encoding_cache.hits()
+    stats.update(count_instructions(words))
+    if not object_file:
+        stats["symbol_table_bytes"] = symbol_table.memory_footprint()
+    return AssemblyResult(seconds, False, 0.0, stats)
+
+
+def format_stats(stats: typing.Dict[str, int]) -> str:
+    """This func formats the counters of an assembly as a one line report"""
+    c_commands: int = stats["c_commands"]
+    hit_rate: float = (100.0 * stats["encoding_cache_hits"] / c_commands
+                       if c_commands else 0.0)
+    report: str = "%d C-commands (%d ALU, %d shift), %.1f%% encoded from " \
+                  "cache" % (c_commands, stats["alu_commands"],
+                             stats["shift_commands"], hit_rate)
+    if "symbol_table_bytes" in stats:
+        report += ", symbol table %.1f KiB" % (
+            stats["symbol_table_bytes"] / 1024)
+    if "unreachable" in stats:
+        report += ", removed %d unreachable words" % stats["unreachable"]
+    peephole_removed: typing.List[str] = [
+        "%s %d" % (key[len("peephole:"):], words_removed)
+        for key, words_removed in stats.items()
+        if key.startswith("peephole:")]
+    if peephole_removed:
+        report += ", peephole removed %d words (%s)" % (
+            sum(value for key, value in stats.items()
+                if key.startswith("peephole:")),
+            ", ".join(peephole_removed))
+    return report
+
+
+def assemble_in_parallel(
+        input_paths: typing.List[str], jobs: int,
+        **options: typing.Any) -> typing.List[typing.Optional[AssemblyResult]]:
+    """This func assembles the given files in a pool of jobs worker processes
+    and reports the time each file took, or the error it failed with, to
+    stderr. A failing file does not stop the rest of the batch. Returns the
+    result of every file, None for the files which failed"""
+    results: typing.List[typing.Optional[AssemblyResult]] = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(assemble_path, input_path, **options)
+                   for input_path in input_paths]
+        # reported in input order so the report is the same on every run
+        for input_path, future in zip(input_paths, futures):
+            try:
+                result: AssemblyResult = future.result()
+            except Exception as error:
+                results.append(None)
+                print("%s: failed: %s: %s" % (
+                    input_path, type(error).__name__, error), file=sys.stderr)
+            else:
+                results.append(result)
+                print("%s: %.3fs%s" % (input_path, result.seconds,
+                                       " (cached)" if result.cached else ""),
+                      file=sys.stderr)
+    return results
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    """This func runs the assembler command line, argv defaults to the
+    arguments of the process. Returns the exit code"""
+    # Parses the input path and calls assemble_path on each input file.
+    # With --binary, a .hackb image of the program is written next to the
+    # .hack file as well.
+    # With --map, a .map file relating the ROM back to the source is written.
+    # With --object, every file is assembled into a relocatable .hacko object
+    # module instead, to be combined by Linker.py.
+    # With --mmap, the source files are memory-mapped instead of read.
+    # With --jobs N, the files are assembled by N worker processes.
+    # With --cache-dir, unchanged sources are not assembled again.
+    # With --stats, counters of every assembled file are reported.
+    # With --optimize, the peephole optimiser runs before labels are resolved.
+    # With --strip-unreachable, code no jump can reach is removed before that.
+    # With --serve, the assembler runs as a daemon instead (see
+    # AssemblerServer), which the Assembler wrapper hands its arguments to
+    # through AssemblerClient.
+    arg_parser = argparse.ArgumentParser(prog="Assembler")
+    arg_parser.add_argument("input_path", nargs="?")
+    arg_parser.add_argument(
+        "--binary", action="store_true",
+        help="also write a binary .hackb image of every assembled file")
+    arg_parser.add_argument(
+        "--map", action="store_true",
+        help="also write a .map file with the source line of every ROM "
+             "address and the label and variable tables")
+    arg_parser.add_argument(
+        "--object", action="store_true",
+        help="assemble every file as a separate unit into a relocatable "
+             ".hacko object module, to be linked by Linker.py")
+    arg_parser.add_argument(
+        "--single-pass", action="store_true",
+        help="assemble in one traversal, backpatching forward references")
+    arg_parser.add_argument(
+        "--mmap", action="store_true",
+        help="memory-map the source files and scan them as bytes, instead of "
+             "reading them as text, best combined with --single-pass")
+    arg_parser.add_argument(
+        "--jobs", type=int, metavar="N",
+        help="assemble the files in N parallel processes, reporting the "
+             "time or failure of each file")
+    arg_parser.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="reuse the outputs of sources assembled before, keyed by a "
+             "hash of the source and the assembler version")
+    arg_parser.add_argument(
+        "--cache-stats", action="store_true",
+        help="report the cache hits, misses and the time saved")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="report statistics of every assembled file")
+    arg_parser.add_argument(
+        "--optimize", nargs="?", const=",".join(PEEPHOLE_RULES),
+        metavar="RULES",
+        help="remove provably useless instructions with the given "
+             "comma-separated peephole rules, all of them by default: " +
+             ", ".join(PEEPHOLE_RULES))
+    arg_parser.add_argument(
+        "--strip-unreachable", action="store_true",
+        help="remove the code no jump or fall-through can reach, keeping "
+             "every label whose address is loaded for a computed jump")
+    arg_parser.add_argument(
+        "--serve", nargs="?", const=default_socket_path(), metavar="SOCKET",
+        help="run as a daemon which assembles the requests sent to the Unix "
+             "socket, %s by default" % default_socket_path())
+    args = arg_parser.parse_args(argv)
+    if args.serve is not None:
+        from AssemblerServer import serve
+        serve(args.serve)
+        return 0
+    if args.input_path is None:
+        arg_parser.error("the following arguments are required: input_path")
+    peephole_rules: typing.Optional[typing.Tuple[str, ...]] = None
+    if args.optimize is not None:
+        peephole_rules = tuple(
+            rule for rule in args.optimize.split(",") if rule)
+        unknown_rules = set(peephole_rules) - set(PEEPHOLE_RULES)
+        if unknown_rules:
+            arg_parser.error("unknown peephole rules: " +
+                             ", ".join(sorted(unknown_rules)))
+    if args.object and (args.binary or args.map or args.strip_unreachable):
+        arg_parser.error("--object can not be combined with --binary, --map "
+                         "or --strip-unreachable, link the objects instead")
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    options: typing.Dict[str, typing.Any] = {
+        "binary": args.binary, "map_file": args.map,
+        "object_file": args.object,
+        "single_pass": args.single_pass, "mmap_input": args.mmap,
+        "cache_dir": args.cache_dir, "peephole_rules": peephole_rules,
+        "strip_unreachable": args.strip_unreachable}
+    if args.jobs is None:
+        results = []
+        for input_path in files_to_assemble:
+            try:
+                results.append(assemble_path(input_path, **options))
+            except ValueError as error:
+                results.append(None)
+                print("Assembler: error: %s: %s" % (input_path, error),
+                      file=sys.stderr)
+    else:
+        results = assemble_in_parallel(files_to_assemble, args.jobs,
+                                       **options)
+    if args.stats:
+        for input_path, result in zip(files_to_assemble, results):
+            if result and result.stats:
+                print("%s: %s" % (input_path, format_stats(result.stats)),
+                      file=sys.stderr)
+    if args.cache_stats:
+        hits: int = sum(1 for result in results if result and result.cached)
+        misses: int = sum(
+            1 for result in results if result and not result.cached)
+        saved: float = sum(result.seconds_saved for result in results
+                           if result)
+        print("cache: %d hits, %d misses, %.3fs saved" % (
+            hits, misses, saved), file=sys.stderr)
+    return 1 if None in results else 0
+
+
+if "__main__" == __name__:
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Instruction
+from SymbolTable import SymbolTable
+
+# The peephole rules, each of them removes instructions which provably can
+# not change the behaviour of the program:
+# - "duplicate-a-load": @X directly followed by @X, e.g. @SP reloaded.
+# - "dead-a-load": @X directly followed by @Y, the first load is never used.
+# - "duplicate-c-command": a C-command directly followed by an identical one,
+#   where running it twice gives the same result as running it once (no
+#   jump, no A in dest, and dest does not overlap the registers comp reads),
+#   e.g. D=M followed by D=M.
+# - "null-c-command": a C-command with neither dest nor jump.
+# - "jump-to-next": @L followed by a jump with no dest, where the label L is
+#   defined right after the jump and followed by an A-command (which
+#   overwrites the A register the removed @L would have left behind).
+# - "stack-round-trip": @SP, M=M+1, @SP, AM=M-1, a push directly followed by
+#   a pop as the VM translator writes them, becomes @SP, A=M, which leaves
+#   SP, A and D the same.
+# - "constant-d-load": @0 or @1, D=A directly followed by an A-command
+#   becomes D=0 or D=1, as the A-command overwrites A anyway.
+# Labels between two commands make them non-adjacent, as the second one may
+# also be reached by a jump. Note that dropping @X may change the order in
+# which variables are first used, and so the RAM addresses they get.
+PEEPHOLE_RULES: typing.Tuple[str, ...] = (
+    "duplicate-a-load", "dead-a-load", "duplicate-c-command",
+    "null-c-command", "jump-to-next", "stack-round-trip", "constant-d-load")
+
+# The commands "stack-round-trip" matches.
+_STACK_ROUND_TRIP: typing.Tuple[str, ...] = ("@SP", "M=M+1", "@SP", "AM=M-1")
+
+
+def _is_idempotent(instruction: Instruction) -> bool:
+    """Does running the C-command twice in a row give the same result as
+    running it once?"""
+    if instruction.jump != "null" or 'A' in instruction.dest:
+        return False
+    reads: typing.Set[str] = set(instruction.comp) & {'A', 'D', 'M'}
+    return instruction.dest == "null" or not reads & set(instruction.dest)
+
+
+def _reduce_tail(output: typing.List[Instruction],
+                 rules: typing.Collection[str],
+                 removed: typing.Dict[str, int]) -> None:
+    """This func applies the rules which match the last instructions of
+    output, until none of them matches anymore"""
+    while output:
+        last: Instruction = output[-1]
+        if last.kind == "C_COMMAND" and "null-c-command" in rules and \
+                last.dest == "null" and last.jump == "null":
+            del output[-1]
+            removed["null-c-command"] += 1
+            continue
+        if len(output) < 2:
+            return
+        previous: Instruction = output[-2]
+        if last.kind == "A_COMMAND" and len(output) >= 3 and \
+                "constant-d-load" in rules and previous.text == "D=A" and \
+                output[-3].kind == "A_COMMAND" and \
+                output[-3].symbol in ("0", "1"):
+            output[-3:-1] = [previous._replace(
+                comp=output[-3].symbol, text="D=" + output[-3].symbol)]
+            removed["constant-d-load"] += 1
+            continue
+        if previous.kind == "A_COMMAND" and last.kind == "A_COMMAND":
+            rule: str = ("duplicate-a-load" if previous.symbol == last.symbol
+                         else "dead-a-load")
+            if rule in rules:
+                del output[-2]
+                removed[rule] += 1
+                continue
+        if last.kind == "C_COMMAND" and last.text == previous.text and \
+                "duplicate-c-command" in rules and _is_idempotent(last):
+            del output[-1]
+            removed["duplicate-c-command"] += 1
+            continue
+        if "stack-round-trip" in rules and tuple(
+                instruction.text for instruction in output[-4:]
+        ) == _STACK_ROUND_TRIP:
+            output[-3:] = [last._replace(dest="A", comp="M", text="A=M")]
+            removed["stack-round-trip"] += 2
+            continue
+        return
+
+
+def _drop_jumps_to_next(
+        output: typing.List[Instruction],
+        first_definitions: typing.Dict[str, Instruction],
+        removed: typing.Dict[str, int]) -> None:
+    """This func is called right before an A-command (or the end of the
+    program) is appended to output, and removes "@L, jump" pairs which are
+    directly followed by the first definition of the label L"""
+    while True:
+        labels_start: int = len(output)
+        while labels_start > 0 and output[labels_start - 1].kind == "L_COMMAND":
+            labels_start -= 1
+        if labels_start == len(output) or labels_start < 2:
+            return
+        load: Instruction = output[labels_start - 2]
+        jump: Instruction = output[labels_start - 1]
+        if load.kind != "A_COMMAND" or jump.kind != "C_COMMAND" or \
+                jump.jump == "null" or jump.dest != "null":
+            return
+        if not any(first_definitions.get(label.symbol) is label and
+                   label.symbol == load.symbol
+                   for label in output[labels_start:]):
+            return
+        del output[labels_start - 2:labels_start]
+        removed["jump-to-next"] += 2
+
+
+def peephole(instructions: typing.Iterable[Instruction],
+             rules: typing.Collection[str] = PEEPHOLE_RULES
+             ) -> typing.Tuple[typing.List[Instruction], typing.Dict[str, int]]:
+    """Runs the peephole rules over the decoded commands of a program. The
+    commands are processed in a single pass, and every rule is re-applied to
+    the end of the output after each removal, so chains such as @X @Y @Z
+    collapse completely.
+
+    Args:
+        instructions (typing.Iterable[Instruction]): the decoded commands,
+            before their labels are resolved.
+        rules (typing.Collection[str]): the names of the rules to apply, out
+            of PEEPHOLE_RULES.
+
+    Returns:
+        typing.Tuple[typing.List[Instruction], typing.Dict[str, int]]: the
+        remaining commands, and the number of ROM words each rule removed.
+    """
+    unknown_rules: typing.Set[str] = set(rules) - set(PEEPHOLE_RULES)
+    if unknown_rules:
+        raise ValueError("unknown peephole rules: " +
+                         ", ".join(sorted(unknown_rules)))
+    removed: typing.Dict[str, int] = {rule: 0 for rule in rules}
+    predefined: SymbolTable = SymbolTable()
+    # the assembler binds a label to its first definition only
+    first_definitions: typing.Dict[str, Instruction] = {}
+    output: typing.List[Instruction] = []
+    for instruction in instructions:
+        if instruction.kind == "L_COMMAND":
+            if not predefined.contains(instruction.symbol):
+                first_definitions.setdefault(instruction.symbol, instruction)
+            output.append(instruction)
+            continue
+        if instruction.kind == "A_COMMAND" and "jump-to-next" in rules:
+            _drop_jumps_to_next(output, first_definitions, removed)
+        output.append(instruction)
+        _reduce_tail(output, rules, removed)
+    if "jump-to-next" in rules:
+        _drop_jumps_to_next(output, first_definitions, removed)
+    return output, removed
+
+
+def eliminate_unreachable(instructions: typing.List[Instruction]
+                          ) -> typing.Tuple[typing.List[Instruction], int]:
+    """Removes the commands which no jump or fall-through can ever reach.
+    The control-flow graph has a fall-through edge from every command which
+    is not an unconditional jump, and an edge from every jump directly
+    preceded by @L to the label L. The analysis is conservative: any label
+    whose address is loaded for anything but the jump right after it (for
+    example @L, D=A for a return address) may be the target of a computed
+    jump, so it is reachable. If a jump targets a fixed ROM address (@17,
+    @R0, ...), nothing is removed, as removing code would move it.
+
+    Args:
+        instructions (typing.List[Instruction]): the decoded commands,
+            before their labels are resolved.
+
+    Returns:
+        typing.Tuple[typing.List[Instruction], int]: the remaining commands
+        and the number of ROM words removed.
+    """
+    predefined: SymbolTable = SymbolTable()
+    # index of the command each label stands for, by its first definition
+    labels: typing.Dict[str, int] = {}
+    for index, instruction in enumerate(instructions):
+        if instruction.kind == "L_COMMAND" and \
+                not predefined.contains(instruction.symbol):
+            labels.setdefault(instruction.symbol, index)
+
+    roots: typing.List[int] = [0]
+    for index, instruction in enumerate(instructions):
+        if instruction.kind != "A_COMMAND":
+            continue
+        following: typing.Optional[Instruction] = (
+            instructions[index + 1] if index + 1 < len(instructions) else None)
+        is_jump_target: bool = (
+            following is not None and following.kind == "C_COMMAND" and
+            following.jump != "null")
+        if instruction.symbol in labels:
+            reads_address: bool = (
+                not is_jump_target or
+                (following.dest != "null" and 'A' in following.comp))
+            if reads_address:
+                roots.append(labels[instruction.symbol])
+        elif is_jump_target:
+            # a numeric, predefined or variable jump target is a fixed ROM
+            # address, which removing code would move
+            return instructions, 0
+
+    reachable: typing.List[bool] = [False] * len(instructions)
+    while roots:
+        index: int = roots.pop()
+        # walk forward along fall-through edges, queueing jump targets
+        while index < len(instructions) and not reachable[index]:
+            reachable[index] = True
+            instruction: Instruction = instructions[index]
+            if instruction.kind == "C_COMMAND" and instruction.jump != "null":
+                previous: typing.Optional[Instruction] = (
+                    instructions[index - 1] if index > 0 else None)
+                if previous is not None and previous.kind == "A_COMMAND" \
+                        and previous.symbol in labels:
+                    roots.append(labels[previous.symbol])
+                if instruction.jump == "JMP":
+                    break
+            index += 1
+
+    end: int = len(instructions)
+    while end > 0 and instructions[end - 1].kind == "L_COMMAND":
+        end -= 1
+    kept: typing.List[Instruction] = []
+    removed: int = 0
+    for index, instruction in enumerate(instructions):
+        if reachable[index]:
+            kept.append(instruction)
+        elif instruction.kind == "L_COMMAND":
+            # the labels standing for the end of the program have nothing to
+            # reach, keep them; any other unreachable label is only ever
+            # referenced from removed code
+            if index >= end:
+                kept.append(instruction)
+        else:
+            removed += 1
+    return kept, removed
@@ -5,8 +5,30 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import io
+import mmap
+from sys import intern
 from typing import *
 
+# Inputs which are scanned as raw bytes instead of as lines of text, for
+# example a memory-mapped source file.
+BUFFER_TYPES: Tuple[type, ...] = (bytes, bytearray, mmap.mmap)
+
+
+class Instruction(NamedTuple):
+    """A single decoded assembly command. Every source line is cleaned and
+    split into its fields exactly once, so the assembler passes only read
+    these records instead of re-parsing the text.
+    """
+    kind: str  # "A_COMMAND", "C_COMMAND" or "L_COMMAND"
+    symbol: Optional[str]  # Xxx of @Xxx or (Xxx), None for C commands
+    dest: Optional[str]  # dest mnemonic of C commands, None otherwise
+    comp: Optional[str]  # comp mnemonic of C commands, None otherwise
+    jump: Optional[str]  # jump mnemonic of C commands, None otherwise
+    text: str  # the command without white space and comments
+    line: int  # 1-based line number of the command in the source file
+
+
 class Parser:
     """Encapsulates access to the input code. Reads an assembly program
     by reading each command line-by-line, parses the current command,
@@ -14,18 +36,134 @@ class Parser:
     and symbols). In addition, removes all white space and comments.
     """
 
-    def __init__(self, input_file: TextIO) -> None:
+    def __init__(self, input_file: Union[Iterable[str], bytes, mmap.mmap]
+                 ) -> None:
         """Opens the input file and gets ready to parse it.
 
         Args:
-            input_file (typing.TextIO): input file.
+            input_file (typing.Union[typing.Iterable[str], bytes, mmap.mmap]):
+                input file, or any other iterable of source lines, or the
+                raw contents of the source file (see iter_instructions).
         """
         # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        self._input_lines: List[str] = input_file.read().splitlines()
-        self._num_lines: int = len(self._input_lines)
+        # Only the decoded commands are kept, the raw text is never held in
+        # memory as a whole.
+        self.instructions: List[Instruction] = list(
+            Parser.iter_instructions(input_file))
+        self._num_lines: int = len(self.instructions)
         self._cur_line: int = -1
 
+    @staticmethod
+    def iter_instructions(input_file: Union[Iterable[str], bytes, mmap.mmap]
+                          ) -> Iterator[Instruction]:
+        """Decodes the input incrementally, reading one line at a time.
+
+        Args:
+            input_file (typing.Union[typing.Iterable[str], bytes, mmap.mmap]):
+                input file, or any other iterable of source lines. The raw
+                contents of the file (bytes, or a memory-mapped file) are
+                scanned by iter_buffer_instructions instead.
+
+        Returns:
+            Iterator[Instruction]: the decoded commands, in source order.
+        """
+        if isinstance(input_file, BUFFER_TYPES):
+            yield from Parser.iter_buffer_instructions(input_file)
+            return
+        for line_number, line in enumerate(input_file, 1):
+            instruction = Parser.parse_line(line, line_number)
+            if instruction is not None:
+                yield instruction
+
+    @staticmethod
+    def iter_buffer_instructions(buffer: Union[bytes, mmap.mmap]
+                                 ) -> Iterator[Instruction]:
+        """Decodes the raw contents of a source file without ever copying
+        or decoding it as a whole. Lines are read out of the buffer one at
+        a time, comments and white space are removed from the bytes, and
+        only the remaining command text is decoded.
+
+        Args:
+            buffer (typing.Union[bytes, mmap.mmap]): the contents of the
+                source file, for example a read-only memory map of it.
+
+        Returns:
+            Iterator[Instruction]: the decoded commands, in source order.
+        """
+        if isinstance(buffer, mmap.mmap):
+            buffer.seek(0)
+            lines: Iterator[bytes] = iter(buffer.readline, b"")
+        else:
+            # shares the buffer of bytes instead of copying it
+            lines: Iterator[bytes] = io.BytesIO(buffer)
+        for line_number, line in enumerate(lines, 1):
+            comment: int = line.find(b"//")
+            if comment >= 0:
+                line = line[:comment]
+            command: bytes = b''.join(line.split())
+            if command:
+                yield Parser.decode_command(command.decode(), line_number)
+
+    @staticmethod
+    def parse_line(line: str, line_number: int) -> Optional[Instruction]:
+        """Decodes a single source line into an Instruction.
+
+        Args:
+            line (str): a raw line of the source file.
+            line_number (int): the 1-based number of the line.
+
+        Returns:
+            Optional[Instruction]: the decoded command, or None if the line
+            holds only white space or comments.
+        """
+        # remove in-line comments and spaces
+        command: str = ''.join(line.split("//")[0].split())
+        if not command:
+            return None
+        return Parser.decode_command(command, line_number)
+
+    @staticmethod
+    def decode_command(command: str, line_number: int) -> Instruction:
+        """Splits a cleaned command into the fields of an Instruction.
+
+        Args:
+            command (str): a command without white space and comments.
+            line_number (int): the 1-based number of its source line.
+
+        Returns:
+            Instruction: the decoded command.
+        """
+        # the same symbols and commands repeat all over generated code, so
+        # every repetition shares a single interned string
+        command = intern(command)
+        if command.startswith('@'):
+            # remove the '@' symbol from A command
+            return Instruction("A_COMMAND", intern(command[1:]), None, None,
+                               None, command, line_number)
+        if command.startswith('('):
+            # remove the '(', ')' symbol from Labels
+            return Instruction("L_COMMAND", intern(command[1:-1]), None, None,
+                               None, command, line_number)
+        dest, equals, rest = command.partition('=')
+        if not equals:
+            dest, rest = "null", command
+        comp, semicolon, jump = rest.partition(';')
+        if not semicolon:
+            jump = "null"
+        return Instruction("C_COMMAND", None, intern(dest), intern(comp),
+                           intern(jump), command, line_number)
+
+    def set_instructions(self, instructions: List[Instruction]) -> None:
+        """Replaces the decoded commands, for example with an optimised
+        version of them, and resets the line counter.
+
+        Args:
+            instructions (typing.List[Instruction]): the new commands.
+        """
+        self.instructions = instructions
+        self._num_lines = len(instructions)
+        self._cur_line = -1
+
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
 
@@ -34,24 +172,18 @@ class Parser:
         """
         return self._num_lines > self._cur_line
 
-    def valid_command(self, command: str) -> bool:
-        """this func receive a string command and return true if it does not
-        contain white spaces or labels and false otherwise"""
-        if command is None:
-            return False
-        stripped = command.strip()
-        if stripped == "" or stripped.startswith("//"):
-            return False
-        return True
-
     def advance(self) -> None:
         """Reads the next command from the input and makes it the current command.
         Should be called only if it has_more_commands() is true.
         """
         self._cur_line += 1  # advance the cur_line index
-        while self.has_more_commands() and not self.valid_command(
-                self._input_lines[self._cur_line]):
-            self._cur_line += 1
+
+    def current(self) -> Instruction:
+        """
+        Returns:
+            Instruction: the decoded current command.
+        """
+        return self.instructions[self._cur_line]
 
     def command_type(self) -> str:
         """
@@ -61,13 +193,7 @@ class Parser:
             "C_COMMAND" for dest=comp;jump
             "L_COMMAND" (actually, pseudo-command) for (Xxx) where Xxx is a symbol
         """
-        command: str = self.clean_command()
-        if command.startswith('@'):
-            return "A_COMMAND"
-        elif command.startswith('('):
-            return "L_COMMAND"
-        else:
-            return "C_COMMAND"
+        return self.current().kind
 
     def symbol(self) -> str:
         """
@@ -76,12 +202,7 @@ class Parser:
             (Xxx). Should be called only when command_type() is "A_COMMAND" or 
             "L_COMMAND".
         """
-        command: str = self.clean_command()
-        c_type: str = self.command_type()
-        if c_type == "A_COMMAND":
-            return command[1:]  # remove the '@' symbol from A command
-        else:
-            return command[1:-1]  # remove the '(', ')' symbol from Labels
+        return self.current().symbol
 
     def dest(self) -> str:
         """
@@ -89,13 +210,7 @@ class Parser:
             str: the dest mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        command: str = self.clean_command()
-        if '=' not in command:
-            return "null"
-        else:
-            divided: List[str] = command.split('=')
-            return divided[0]
-            # return the dest part of command on the left side of the '='
+        return self.current().dest
 
     def comp(self) -> str:
         """
@@ -103,20 +218,7 @@ class Parser:
             str: the comp mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        command: str = self.clean_command()
-        if ';' not in command:
-            divided: List[str] = command.split('=')
-            return divided[1]
-
-        elif '=' not in command:
-            divided: List[str] = command.split(';')
-            return divided[0]
-
-        else:
-            divided1: List[str] = command.split('=')
-            divided2: List[str] = divided1[1].split(';')
-            return divided2[0]
-        # dividing twice the command and removing the dest and jump parts
+        return self.current().comp
 
     def jump(self) -> str:
         """
@@ -124,19 +226,8 @@ class Parser:
             str: the jump mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        command: str = self.clean_command()
-        if ';' not in command:
-            return "null"
-        else:
-            divided: List[str] = command.split(';')
-            return divided[1]
-        # return the jump part of command on the right side of the ';'
+        return self.current().jump
 
     def reset_line_counter(self):
         """Func reset the line counter to 0"""
         self._cur_line = -1
-
-    def clean_command(self) -> str:
-        line = self._input_lines[self._cur_line]
-        # remove in-line comments and spaces
-        return ''.join(line.split("//")[0].split())
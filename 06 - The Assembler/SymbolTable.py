@@ -5,12 +5,51 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import sys
+import types
+import typing
+from array import array
+
+# The predefined symbols and their pre-allocated RAM addresses, according to
+# section 6.2.3 of the book. A single read-only mapping is shared by all the
+# symbol tables, instead of being copied into each of them.
+PREDEFINED_SYMBOLS: typing.Mapping[str, int] = types.MappingProxyType({
+    "R0": 0,
+    "R1": 1,
+    "R2": 2,
+    "R3": 3,
+    "R4": 4,
+    "R5": 5,
+    "R6": 6,
+    "R7": 7,
+    "R8": 8,
+    "R9": 9,
+    "R10": 10,
+    "R11": 11,
+    "R12": 12,
+    "R13": 13,
+    "R14": 14,
+    "R15": 15,
+    "SCREEN": 16384,
+    "KBD": 24576,
+    "SP": 0,
+    "LCL": 1,
+    "ARG": 2,
+    "THIS": 3,
+    "THAT": 4
+})
 
 
 class SymbolTable:
     """
     A symbol table that keeps a correspondence between symbolic labels and 
     numeric addresses.
+
+    Programs produced by the VM translator define tens of thousands of long
+    labels, so the table is kept compact: every symbol name is interned (and
+    so shared with the parsed commands which use it), the names map to slots,
+    and the address and kind of every slot are stored in arrays instead of
+    as Python objects.
     """
 
     def __init__(self) -> None:
@@ -18,40 +57,29 @@ class SymbolTable:
         and their pre-allocated RAM addresses, according to section 6.2.3 of the
         book.
         """
-        self._symbol_table = {
-            "R0": 0,
-            "R1": 1,
-            "R2": 2,
-            "R3": 3,
-            "R4": 4,
-            "R5": 5,
-            "R6": 6,
-            "R7": 7,
-            "R8": 8,
-            "R9": 9,
-            "R10": 10,
-            "R11": 11,
-            "R12": 12,
-            "R13": 13,
-            "R14": 14,
-            "R15": 15,
-            "SCREEN": 16384,
-            "KBD": 24576,
-            "SP": 0,
-            "LCL": 1,
-            "ARG": 2,
-            "THIS": 3,
-            "THAT": 4
-        }
-
-    def add_entry(self, symbol: str, address: int) -> None:
+        self._slots: typing.Dict[str, int] = {}
+        self._addresses: array = array('I')
+        # 1 for variables (RAM addresses), 0 for labels (ROM addresses)
+        self._is_variable: array = array('B')
+
+    def add_entry(self, symbol: str, address: int,
+                  variable: bool = False) -> None:
         """Adds the pair (symbol, address) to the table.
 
         Args:
             symbol (str): the symbol to add.
             address (int): the address corresponding to the symbol.
+            variable (bool): True if the symbol is a variable (a RAM address),
+                False if it is a label (a ROM address).
         """
-        self._symbol_table[symbol] = address
+        slot: typing.Optional[int] = self._slots.get(symbol)
+        if slot is None:
+            self._slots[sys.intern(symbol)] = len(self._addresses)
+            self._addresses.append(address)
+            self._is_variable.append(variable)
+        else:
+            self._addresses[slot] = address
+            self._is_variable[slot] = variable
 
     def contains(self, symbol: str) -> bool:
         """Does the symbol table contain the given symbol?
@@ -62,7 +90,7 @@ class SymbolTable:
         Returns:
             bool: True if the symbol is contained, False otherwise.
         """
-        return symbol in self._symbol_table
+        return symbol in self._slots or symbol in PREDEFINED_SYMBOLS
 
     def get_address(self, symbol: str) -> int:
         """Returns the address associated with the symbol.
@@ -73,4 +101,47 @@ class SymbolTable:
         Returns:
             int: the address associated with the symbol.
         """
-        return self._symbol_table[symbol]
+        slot: typing.Optional[int] = self._slots.get(symbol)
+        if slot is None:
+            return PREDEFINED_SYMBOLS[symbol]
+        return self._addresses[slot]
+
+    def _entries(self, variables: bool) -> typing.List[typing.Tuple[str, int]]:
+        """Returns the (symbol, address) pairs of either the variables or the
+        labels, sorted by address"""
+        return sorted(((symbol, self._addresses[slot])
+                       for symbol, slot in self._slots.items()
+                       if self._is_variable[slot] == variables and
+                       symbol not in PREDEFINED_SYMBOLS),
+                      key=lambda entry: entry[1])
+
+    def labels(self) -> typing.List[typing.Tuple[str, int]]:
+        """
+        Returns:
+            typing.List[typing.Tuple[str, int]]: the (label, ROM address)
+            pairs of the program, sorted by address.
+        """
+        return self._entries(False)
+
+    def variables(self) -> typing.List[typing.Tuple[str, int]]:
+        """
+        Returns:
+            typing.List[typing.Tuple[str, int]]: the (variable, RAM address)
+            pairs of the program, sorted by address.
+        """
+        return self._entries(True)
+
+    def memory_footprint(self) -> int:
+        """
+        Returns:
+            int: the number of bytes the table takes, including its symbol
+            names but not the shared predefined symbols. The names are
+            interned, so they may be shared with the parsed program.
+        """
+        return (sys.getsizeof(self._slots) +
+                sum(map(sys.getsizeof, self._slots)) +
+                # CPython shares the int objects of 0 to 256
+                sum(sys.getsizeof(slot) for slot in self._slots.values()
+                    if slot > 256) +
+                sys.getsizeof(self._addresses) +
+                sys.getsizeof(self._is_variable))
@@ -0,0 +1,224 @@
+"""
+Benchmarks the throughput of the assembler on synthetic programs of
+configurable size and mix, and on Pong.asm. Every workload fits in the
+Hack ROM, as the assembler refuses larger programs. Every workload is written to a temporary .asm file and assembled in a fresh
+worker process, which times the parse, first-pass, second-pass and write
+phases separately and reports its own peak RSS. The results are printed (or
+written with --output) as JSON, so they can be compared between releases.
+
+Usage:
+    python3 bench/run_assembler_bench.py --lines 10000 32000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+ASSEMBLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ASSEMBLER_DIR)
+
+from Parser import Parser
+from SymbolTable import SymbolTable
+from Main import (ASSEMBLER_VERSION, ROM_SIZE, first_pass, second_pass,
+                  write_hack, map_source)
+
+ALU_COMMANDS = ["D=M", "M=D", "D=A", "AM=M-1", "A=M", "M=M+1", "D=D+M",
+                "D=M-D", "M=M-1", "D=-1", "M=0", "A=A-1", "MD=M+1", "D=D&A",
+                "M=D|M", "D=!D"]
+SHIFT_COMMANDS = ["D=D<<", "D=D>>", "M=M<<", "M=M>>", "A=A<<", "AD=A>>"]
+JUMP_COMMANDS = ["0;JMP", "D;JGT", "D;JEQ", "D;JNE", "D;JLT"]
+PREDEFINED_SYMBOLS = ["SP", "LCL", "ARG", "THIS", "THAT", "R13", "R14", "R15",
+                      "SCREEN", "KBD"]
+PHASES = ["parse", "first_pass", "second_pass", "write"]
+
+
+def generate_synthetic(instructions: int, label_density: float,
+                       variables: int, shift_share: float,
+                       seed: int) -> typing.List[str]:
+    """Generates a synthetic program of the given number of instructions.
+    label_density is the number of labels per instruction, variables the
+    number of distinct variables, and shift_share the share of the
+    C-commands which are extended shift commands"""
+    rng = random.Random(seed)
+    label_positions = sorted(rng.sample(
+        range(instructions), int(instructions * label_density)))
+    next_label = 0
+    lines = ["// synthetic assembler benchmark, %d instructions" % instructions]
+    emitted = 0
+    while emitted < instructions:
+        while next_label < len(label_positions) and \
+                label_positions[next_label] <= emitted:
+            lines.append("(L%d)" % next_label)
+            next_label += 1
+        choice = rng.random()
+        if choice < 0.05:
+            lines.append("// comment line")
+            continue
+        if choice < 0.5:
+            kind = rng.random()
+            if label_positions and kind < 0.3 and \
+                    emitted + 2 <= instructions:
+                # a jump to a label, before or after this point
+                lines.append("@L%d" % rng.randrange(len(label_positions)))
+                lines.append(rng.choice(JUMP_COMMANDS))
+                emitted += 2
+                continue
+            if variables and kind < 0.6:
+                lines.append("@var%d" % rng.randrange(variables))
+            elif kind < 0.8:
+                lines.append("@%d" % rng.randrange(ROM_SIZE))
+            else:
+                lines.append("@" + rng.choice(PREDEFINED_SYMBOLS))
+        elif rng.random() < shift_share:
+            lines.append(rng.choice(SHIFT_COMMANDS))
+        else:
+            lines.append(rng.choice(ALU_COMMANDS) +
+                         ("    // trailing comment" if choice > 0.95 else ""))
+        emitted += 1
+    return lines
+
+
+def peak_rss_kb() -> int:
+    """Returns the peak resident set size of this process, in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_worker(input_path: str, repeat: int,
+               mapped: bool) -> typing.Dict[str, typing.Any]:
+    """Assembles input_path repeat times, phase by phase, and returns the
+    best time of every phase with the peak RSS of the process. If mapped is
+    True, the source is memory-mapped instead of read as text"""
+    best = {phase: float("inf") for phase in PHASES}
+    output_path = os.path.splitext(input_path)[0] + ".hack"
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(input_path, 'rb' if mapped else 'r') as input_file:
+            source = map_source(input_file) if mapped else input_file
+            parser = Parser(source)
+        parsed = time.perf_counter()
+        symbol_table = SymbolTable()
+        first_pass(symbol_table, parser)
+        first = time.perf_counter()
+        words = second_pass(symbol_table, parser)
+        second = time.perf_counter()
+        with open(output_path, 'w') as output_file:
+            write_hack(words, output_file)
+        written = time.perf_counter()
+        for phase, seconds in zip(PHASES, (parsed - start, first - parsed,
+                                           second - first, written - second)):
+            best[phase] = min(best[phase], seconds)
+    with open(input_path, 'r') as input_file:
+        source_lines = sum(1 for _ in input_file)
+    return {"lines": source_lines, "instructions": len(words),
+            "seconds": best, "peak_rss_kb": peak_rss_kb(),
+            "symbol_table_bytes": symbol_table.memory_footprint()}
+
+
+def measure(name: str, lines: typing.List[str], work_dir: str,
+            repeat: int, mapped: bool) -> typing.Dict[str, typing.Any]:
+    """Writes a workload to work_dir, assembles it in a worker process and
+    returns its results"""
+    input_path = os.path.join(work_dir, name + ".asm")
+    with open(input_path, 'w') as input_file:
+        input_file.write('\n'.join(lines) + '\n')
+    worker = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", input_path,
+         "--repeat", str(repeat)] + (["--mmap"] if mapped else []),
+        check=True, capture_output=True, text=True)
+    result = json.loads(worker.stdout)
+    seconds = result.pop("seconds")
+    total = sum(seconds.values())
+    result["phases"] = {
+        phase: {"seconds": round(seconds[phase], 6),
+                "lines_per_second": round(result["lines"] / seconds[phase])
+                if seconds[phase] else None}
+        for phase in PHASES}
+    result["total"] = {"seconds": round(total, 6),
+                       "lines_per_second": round(result["lines"] / total)}
+    return dict(name=name, **result)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(prog="run_assembler_bench")
+    arg_parser.add_argument(
+        "--lines", type=int, nargs="*", default=[10000, 30000],
+        metavar="N", help="sizes, in instructions, of the synthetic "
+                          "workloads, at most %d" % ROM_SIZE)
+    arg_parser.add_argument(
+        "--label-density", type=float, default=0.02,
+        help="labels per instruction in the synthetic workloads")
+    arg_parser.add_argument(
+        "--variables", type=int, default=200,
+        help="distinct variables in the synthetic workloads")
+    arg_parser.add_argument(
+        "--shift-share", type=float, default=0.1,
+        help="share of the C-commands which are extended shift commands")
+    arg_parser.add_argument(
+        "--no-pong", action="store_true",
+        help="do not assemble pong/Pong.asm as a workload")
+    arg_parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="assemble every workload this many times, keeping the best time "
+             "of every phase")
+    arg_parser.add_argument(
+        "--mmap", action="store_true",
+        help="memory-map the sources instead of reading them as text")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--output", metavar="FILE",
+        help="write the JSON results to FILE instead of stdout")
+    arg_parser.add_argument("--worker", metavar="ASM", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.worker:
+        json.dump(run_worker(args.worker, args.repeat, args.mmap), sys.stdout)
+        return
+    oversized = [instructions for instructions in args.lines
+                 if instructions > ROM_SIZE]
+    if oversized:
+        arg_parser.error("the ROM holds %d words, --lines %s do not fit" % (
+            ROM_SIZE, " ".join(str(size) for size in oversized)))
+
+    with open(os.path.join(ASSEMBLER_DIR, "pong", "Pong.asm"), 'r') as pong:
+        pong_lines = pong.read().splitlines()
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for instructions in args.lines:
+            results.append(measure(
+                "synthetic-%d" % instructions,
+                generate_synthetic(instructions, args.label_density,
+                                   args.variables, args.shift_share,
+                                   args.seed),
+                work_dir, args.repeat, args.mmap))
+        if not args.no_pong:
+            results.append(measure("pong", pong_lines, work_dir, args.repeat,
+                                   args.mmap))
+    report = {
+        "assembler_version": ASSEMBLER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"label_density": args.label_density,
+                       "variables": args.variables,
+                       "shift_share": args.shift_share,
+                       "repeat": args.repeat, "seed": args.seed,
+                       "mmap": args.mmap},
+        "workloads": results}
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if "__main__" == __name__:
+    main()
@@ -0,0 +1,111 @@
+"""
+Tests of the assembler daemon, which runs Main.py --serve on a temporary
+Unix socket and sends it requests through the client.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+ASSEMBLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ASSEMBLER_DIR)
+
+import AssemblerClient
+import AssemblerServer
+
+BAD_SOURCE = "@1\nD=Q\n"
+
+
+class AssemblerServerTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "assembler.sock")
+        with open(os.path.join(self.directory.name, "Bad.asm"), 'w') as file:
+            file.write(BAD_SOURCE)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _start_daemon(self, umask: int = 0o022) -> subprocess.Popen:
+        """Starts a daemon on the test socket and waits until it listens"""
+        daemon = subprocess.Popen(
+            [sys.executable, os.path.join(ASSEMBLER_DIR, "Main.py"),
+             "--serve", self.socket_path], stderr=subprocess.DEVNULL,
+            preexec_fn=lambda: os.umask(umask))
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            time.sleep(0.05)
+        return daemon
+
+    def _stop_daemon(self, daemon: subprocess.Popen) -> None:
+        if daemon.poll() is None:
+            AssemblerClient.request({"shutdown": True}, self.socket_path)
+            daemon.wait(timeout=10)
+
+    def test_command_line_error_is_reported(self) -> None:
+        response = AssemblerServer.handle(
+            {"argv": ["Bad.asm"], "cwd": self.directory.name})
+        self.assertNotEqual(response["exit_code"], 0)
+        self.assertIn("KeyError", response["stderr"])
+
+    def test_bad_file_through_daemon(self) -> None:
+        daemon = self._start_daemon()
+        try:
+            os.environ["ASSEMBLER_SOCKET"] = self.socket_path
+            previous_cwd = os.getcwd()
+            os.chdir(self.directory.name)
+            stdout, stderr = io.StringIO(), io.StringIO()
+            try:
+                with contextlib.redirect_stdout(stdout), \
+                        contextlib.redirect_stderr(stderr):
+                    exit_code = AssemblerClient.main(["Bad.asm"])
+            finally:
+                os.chdir(previous_cwd)
+                del os.environ["ASSEMBLER_SOCKET"]
+            self.assertNotEqual(exit_code, 0)
+            self.assertIn("KeyError", stderr.getvalue())
+            # the daemon survives the error
+            self.assertTrue(AssemblerClient.request(
+                {"ping": True}, self.socket_path)["ok"])
+        finally:
+            self._stop_daemon(daemon)
+
+    def test_socket_is_private_whatever_the_umask(self) -> None:
+        daemon = self._start_daemon(umask=0o002)
+        try:
+            self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+        finally:
+            self._stop_daemon(daemon)
+
+    def test_failed_request_returns_1(self) -> None:
+        original_request = AssemblerClient.request
+        AssemblerClient.request = lambda message, socket_path=None: {
+            "ok": False, "error": "ValueError: unknown request"}
+        os.environ["ASSEMBLER_SOCKET"] = self.socket_path
+        open(self.socket_path, 'w').close()
+        stderr = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(stderr):
+                exit_code = AssemblerClient.main(["Bad.asm"])
+        finally:
+            AssemblerClient.request = original_request
+            del os.environ["ASSEMBLER_SOCKET"]
+        self.assertEqual(exit_code, 1)
+        self.assertIn("unknown request", stderr.getvalue())
+
+    def test_socket_of_another_kind_is_refused(self) -> None:
+        # a regular file is not a socket the daemon created
+        open(self.socket_path, 'w').close()
+        self.assertFalse(AssemblerClient.owned_by_user(self.socket_path))
+        with self.assertRaises(PermissionError):
+            AssemblerClient.request({"ping": True}, self.socket_path)
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Tests of relocatable object modules and the linker, against the assembly of
+the concatenated sources.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+ASSEMBLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ASSEMBLER_DIR)
+
+from HackObject import read_object
+from Linker import link
+from Main import ROM_SIZE, assemble, assemble_object, main
+
+# The entry unit jumps into the others, which jump back into it, and the
+# variables x and y are shared between units, while each unit also has
+# variables of its own.
+UNITS = [
+    ("Main", """@256
+D=A
+@SP
+M=D
+@x
+M=1
+@MATH_START
+0;JMP
+(MAIN_BACK)
+@main_only
+M=D
+@MEMORY_START
+0;JMP
+(MAIN_END)
+@MAIN_END
+0;JMP
+"""),
+    ("Math", """(MATH_START)
+@y
+M=-1
+@math_only
+D=M
+(MATH_LOOP)
+@x
+D=D+M
+@MATH_LOOP
+D;JLT
+@MAIN_BACK
+0;JMP
+"""),
+    ("Memory", """(MEMORY_START)
+@y
+D=M
+@memory_only
+M=D
+@R13
+M=D
+@SCREEN
+M=-1
+@MAIN_END
+0;JMP
+"""),
+]
+
+
+def _objects_through_command_line(directory: str):
+    """Assembles every unit into a .hacko file with --object, and reads the
+    object modules back in link order"""
+    for name, source in UNITS:
+        with open(os.path.join(directory, name + ".asm"), 'w') as unit_file:
+            unit_file.write(source)
+    with contextlib.redirect_stderr(io.StringIO()):
+        assert main(["--object", directory]) == 0
+    objects = []
+    for name, source in UNITS:
+        with open(os.path.join(directory, name + ".hacko")) as object_file:
+            objects.append(read_object(object_file))
+    return objects
+
+
+class LinkerTest(unittest.TestCase):
+
+    def test_same_words_as_the_concatenated_source(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            objects = _objects_through_command_line(directory)
+        words, symbol_table = link(objects)
+        expected, expected_symbols, source_lines = assemble(
+            "".join(source for name, source in UNITS))
+        self.assertEqual(list(words), list(expected))
+        for symbol in ["MATH_START", "MAIN_BACK", "MEMORY_START", "MAIN_END",
+                       "x", "y", "main_only", "math_only", "memory_only"]:
+            self.assertEqual(symbol_table.get_address(symbol),
+                             expected_symbols.get_address(symbol), symbol)
+        # variables from 16, in order of first use over the linked units
+        self.assertEqual([symbol_table.get_address(symbol) for symbol in
+                          ["x", "main_only", "y", "math_only", "memory_only"]],
+                         [16, 17, 18, 19, 20])
+
+    def test_relocations_and_imports(self) -> None:
+        hack_object = assemble_object(UNITS[1][1], "Math")
+        # @MATH_LOOP, the unit's own label, moves with the unit, while
+        # @MAIN_BACK, @x and @y are left to the linker
+        self.assertEqual(hack_object.exports,
+                         {"MATH_START": 0, "MATH_LOOP": 4})
+        self.assertEqual(hack_object.relocations, [6])
+        self.assertEqual(sorted(hack_object.imports),
+                         ["MAIN_BACK", "math_only", "x", "y"])
+        base = len(assemble_object(UNITS[0][1], "Main").code)
+        words, symbol_table = link([assemble_object(UNITS[0][1], "Main"),
+                                    hack_object])
+        self.assertEqual(words[base + 6], base + 4)
+
+    def test_private_labels_of_the_same_name(self) -> None:
+        # each unit jumps to its own LOOP, where the concatenated source
+        # would bind both to the first definition
+        first = assemble_object("(LOOP)\n@LOOP\n0;JMP\n", "First")
+        second = assemble_object("D=0\n(LOOP)\n@LOOP\n0;JMP\n", "Second")
+        words, symbol_table = link([first, second])
+        self.assertEqual(words[0], 0)
+        self.assertEqual(words[3], 3)
+
+    def test_imported_label_defined_twice(self) -> None:
+        objects = [assemble_object("@LOOP\n0;JMP\n", "Main"),
+                   assemble_object("(LOOP)\n0;JMP\n", "First"),
+                   assemble_object("(LOOP)\n0;JMP\n", "Second")]
+        with self.assertRaisesRegex(ValueError, "LOOP is defined by more "
+                                                "than one module: First, "
+                                                "Second"):
+            link(objects)
+
+    def test_program_larger_than_the_rom(self) -> None:
+        half = assemble_object("D=0\n" * (ROM_SIZE // 2 + 1), "Half")
+        with self.assertRaisesRegex(ValueError, "the ROM holds 32768"):
+            link([half, half])
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests of the assembler passes.
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ASSEMBLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ASSEMBLER_DIR)
+
+from Main import (ASSEMBLER_VERSION, ROM_SIZE, assemble, main,
+                  source_digest)
+
+
+class RomSizeTest(unittest.TestCase):
+
+    def test_full_rom_assembles(self) -> None:
+        for single_pass in [False, True]:
+            words, symbol_table, source_lines = assemble(
+                "(LOOP)\n" + "D=0\n" * (ROM_SIZE - 2) + "@LOOP\n0;JMP\n",
+                single_pass=single_pass)
+            self.assertEqual(len(words), ROM_SIZE)
+
+    def test_oversized_program_is_refused(self) -> None:
+        for single_pass in [False, True]:
+            with self.assertRaisesRegex(ValueError, "the ROM holds 32768"):
+                assemble("@LOOP\n" + "D=0\n" * ROM_SIZE + "(LOOP)\n",
+                         single_pass=single_pass)
+
+
+    def test_oversized_file_is_reported(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, "Big.asm")
+            with open(input_path, 'w') as input_file:
+                input_file.write("D=0\n" * (ROM_SIZE + 1))
+            # the output of an earlier run is left as it is
+            with open(os.path.join(directory, "Big.hack"), 'w') as hack_file:
+                hack_file.write("0000000000000000\n")
+            for options in [[], ["--single-pass"], ["--object"]]:
+                stderr = io.StringIO()
+                with contextlib.redirect_stderr(stderr):
+                    exit_code = main(options + [input_path])
+                self.assertEqual(exit_code, 1)
+                self.assertEqual(
+                    stderr.getvalue(), "Assembler: error: %s: the program "
+                    "takes %d words, the ROM holds %d\n" % (
+                        input_path, ROM_SIZE + 1, ROM_SIZE))
+                self.assertEqual(sorted(os.listdir(directory)),
+                                 ["Big.asm", "Big.hack"])
+            with open(os.path.join(directory, "Big.hack")) as hack_file:
+                self.assertEqual(hack_file.read(), "0000000000000000\n")
+
+
+class AssemblerVersionTest(unittest.TestCase):
+
+    def test_version_follows_the_sources(self) -> None:
+        self.assertTrue(ASSEMBLER_VERSION.endswith(
+            source_digest(ASSEMBLER_DIR)))
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in os.listdir(ASSEMBLER_DIR):
+                if filename.endswith(".py"):
+                    shutil.copy(os.path.join(ASSEMBLER_DIR, filename),
+                                directory)
+            digest: str = source_digest(directory)
+            self.assertEqual(digest, source_digest(ASSEMBLER_DIR))
+            with open(os.path.join(directory, "Code.py"), 'a') as source:
+                source.write("\n")
+            self.assertNotEqual(source_digest(directory), digest)
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests of the peephole optimizer and of unreachable code elimination.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ASSEMBLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ASSEMBLER_DIR)
+
+from Main import assemble
+from Optimizer import PEEPHOLE_RULES, eliminate_unreachable, peephole
+from Parser import Parser
+
+TRANSLATOR = os.path.join(os.path.dirname(ASSEMBLER_DIR),
+                          "08 - Virtual Machine p.2", "Main.py")
+# Main.vm and Math.vm, the whole OS does not fit in the ROM
+MATH_TEST_VM = os.path.join(os.path.dirname(ASSEMBLER_DIR),
+                            "12 - The Operating System", "tests", "MathTest")
+
+
+def _optimized(source: str) -> str:
+    output, removed = peephole(Parser(source.splitlines()).instructions)
+    return "\n".join(instruction.text for instruction in output)
+
+
+class PeepholeTest(unittest.TestCase):
+
+    def test_stack_round_trip(self) -> None:
+        self.assertEqual(
+            _optimized("@SP\nA=M\nM=D\n@SP\nM=M+1\n@SP\nAM=M-1\nD=M"),
+            "@SP\nA=M\nM=D\n@SP\nA=M\nD=M")
+        # a label makes the pop reachable without the push
+        self.assertEqual(_optimized("@SP\nM=M+1\n(L)\n@SP\nAM=M-1"),
+                         "@SP\nM=M+1\n(L)\n@SP\nAM=M-1")
+
+    def test_constant_d_load(self) -> None:
+        self.assertEqual(_optimized("@0\nD=A\n@SP"), "D=0\n@SP")
+        self.assertEqual(_optimized("@1\nD=A\n@SP"), "D=1\n@SP")
+        # A is still read after the load
+        self.assertEqual(_optimized("@0\nD=A\nM=D"), "@0\nD=A\nM=D")
+        self.assertEqual(_optimized("@10\nD=A\n@SP"), "@10\nD=A\n@SP")
+
+    def test_translator_output(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            program = os.path.join(directory, "MathTest")
+            shutil.copytree(MATH_TEST_VM, program)
+            subprocess.run([sys.executable, TRANSLATOR, program], check=True,
+                           stdout=subprocess.DEVNULL)
+            with open(os.path.join(program, "MathTest.asm")) as asm_file:
+                source = asm_file.read()
+        plain, symbol_table, source_lines = assemble(source)
+        stats = {}
+        optimized, symbol_table, source_lines = assemble(
+            source, peephole_rules=PEEPHOLE_RULES, stats=stats)
+        self.assertGreater(stats["peephole:stack-round-trip"], 0)
+        self.assertGreater(stats["peephole:constant-d-load"], 0)
+        self.assertEqual(len(plain) - len(optimized),
+                         sum(stats.values()))
+        self.assertGreater(len(plain), len(optimized))
+
+
+class UnreachableTest(unittest.TestCase):
+
+    def test_dead_code_is_removed(self) -> None:
+        instructions = Parser(
+            "@END\n0;JMP\nD=0\n(END)\n@END\n0;JMP".splitlines()).instructions
+        kept, removed = eliminate_unreachable(instructions)
+        self.assertEqual(removed, 1)
+
+    def test_fixed_address_jump_keeps_everything(self) -> None:
+        # like the jumps of Pong.asm, to a numeric ROM address
+        instructions = Parser(
+            "@4\n0;JMP\nD=0\nD=1\n@4\n0;JMP".splitlines()).instructions
+        self.assertEqual(eliminate_unreachable(instructions),
+                         (instructions, 0))
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+from Fusion import VMCommand
+
+# The function the bootstrap code calls, the root of the call graph.
+ENTRY_FUNCTION: str = "Sys.init"
+
+
+class VMFunction(typing.NamedTuple):
+    """A function of a program with the file it is in. The commands which
+    come before the first function of a file are kept as a function named
+    ""."""
+    name: str
+    file_name: str
+    commands: typing.List[VMCommand]
+
+
+def split_functions(file_name: str, commands: typing.Iterable[VMCommand]
+                    ) -> typing.List[VMFunction]:
+    """This func splits the commands of a file into its functions"""
+    functions: typing.List[VMFunction] = []
+    current: VMFunction = VMFunction("", file_name, [])
+    for command in commands:
+        if command.command_type == "C_FUNCTION":
+            if current.name or current.commands:
+                functions.append(current)
+            current = VMFunction(command.arg1, file_name, [])
+        current.commands.append(command)
+    if current.name or current.commands:
+        functions.append(current)
+    return functions
+
+
+def reachable_functions(functions: typing.List[VMFunction],
+                        roots: typing.Iterable[str]) -> typing.Set[str]:
+    """Returns the names of the functions which the roots can call, directly
+    or through other functions, the roots included. VM code has no function
+    pointers, so every call is to a function named in a call command.
+
+    Args:
+        functions (typing.List[VMFunction]): the functions of the program.
+        roots (typing.Iterable[str]): the functions which run first.
+
+    Returns:
+        typing.Set[str]: the names of the reachable functions.
+    """
+    callees: typing.Dict[str, typing.Set[str]] = {}
+    for function in functions:
+        callees.setdefault(function.name, set()).update(
+            command.arg1 for command in function.commands
+            if command.command_type == "C_CALL")
+    reachable: typing.Set[str] = set()
+    pending: typing.List[str] = list(roots)
+    while pending:
+        name: str = pending.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        pending.extend(callees.get(name, ()))
+    return reachable
+
+
+def strip_dead_functions(
+        functions: typing.List[VMFunction]
+) -> typing.Tuple[typing.List[VMFunction], typing.List[VMFunction]]:
+    """Splits the functions of a program into those reachable from
+    ENTRY_FUNCTION, and the dead ones. The code before the first function of
+    a file runs as is, so it is a root as well. A program without
+    ENTRY_FUNCTION is kept whole.
+
+    Args:
+        functions (typing.List[VMFunction]): the functions of the program.
+
+    Returns:
+        typing.Tuple[typing.List[VMFunction], typing.List[VMFunction]]: the
+        reachable functions and the dead functions, both in program order.
+    """
+    if not any(function.name == ENTRY_FUNCTION for function in functions):
+        return functions, []
+    reachable: typing.Set[str] = reachable_functions(
+        functions, [ENTRY_FUNCTION, ""])
+    kept: typing.List[VMFunction] = []
+    dead: typing.List[VMFunction] = []
+    for function in functions:
+        (kept if function.name in reachable else dead).append(function)
+    return kept, dead
@@ -7,21 +7,94 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+# The jump of every comparison command, taken when the comparison is false.
+COMPARISON_JUMPS: typing.Dict[str, str] = {"gt": "JLE", "lt": "JGE",
+                                           "eq": "JNE"}
+
+# The segments whose base address is held in a register.
+SEGMENT_POINTERS: typing.Dict[str, str] = {"local": "LCL", "this": "THIS",
+                                           "that": "THAT", "argument": "ARG"}
+
+# Up to these indices, the address of local i (argument i, ...) is computed
+# by stepping A from the base address, "A=M+1" then "A=A+1" i-1 times,
+# instead of with "@i D=A" and an addition. A push then takes at most as many
+# words as with the addition, and a pop does not need a scratch register.
+MAX_STEPPED_PUSH_INDEX: int = 3
+MAX_STEPPED_POP_INDEX: int = 7
+
+# Functions with up to this many local variables zero them with unrolled
+# stores, 2n+4 words and cycles, larger ones call the shared $ZERO_LOCALS
+# loop, 8 words at the call site but 8 cycles a variable. For size (None),
+# the limit is computed by CodeWriter.max_unrolled_locals_for_size, so the
+# loop is only used when its call site is shorter than the stores.
+MAX_UNROLLED_LOCALS: typing.Dict[str, typing.Optional[int]] = {
+    "speed": 16, "size": None}
+
+
+def count_words(asm: str) -> int:
+    """This func returns the number of ROM words the given assembly code
+    takes, that is its lines which are not labels, comments or empty"""
+    words: int = 0
+    for line in asm.split("\n"):
+        line = line.strip()
+        if line and not line.startswith("(") and not line.startswith("//"):
+            words += 1
+    return words
+
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Initializes the CodeWriter.
+    def __init__(self, output_stream: typing.TextIO,
+                 shared_compare: bool = False,
+                 shared_calls: bool = False,
+                 cache_top: bool = False,
+                 optimize_for: str = "speed") -> None:
+        """Initializes the CodeWriter. A single CodeWriter translates all the
+        files of a program, so the labels it generates are unique.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            shared_compare (bool): if this is True, eq, gt and lt jump to a
+                routine shared by all the comparisons of the same kind,
+                written by close(), instead of being inlined.
+            shared_calls (bool): if this is True, call and return jump to
+                the shared $CALL and $RETURN routines, written by close(),
+                instead of being inlined.
+            cache_top (bool): if this is True, the value on top of the
+                stack is kept in D for as long as the following commands
+                can work on it there, and is only written to the stack when
+                D is needed for something else, or at labels, jumps, calls,
+                function entries and returns.
+            optimize_for (str): "speed" or "size", chooses between faster
+                and shorter code where they differ, see MAX_UNROLLED_LOCALS.
         """
         self._output_stream: typing.TextIO = output_stream
         self._file_name = ""
         self._current_label_arithmetic = 0
         self._function_name = ""
         self._cur_function_calls = 0
+        self._shared_compare: bool = shared_compare
+        # the comparison commands translated so far, in order of first use
+        self._comparisons: typing.Dict[str, int] = {}
+        self._shared_calls: bool = shared_calls
+        self._calls: int = 0
+        self._returns: int = 0
+        self._cache_top: bool = cache_top
+        # True when the top of the stack is in D and not yet on the stack, SP
+        # then points at the address it belongs to
+        self._top_in_d: bool = False
+        self._pushes: int = 0
+        self._flushes: int = 0
+        max_unrolled_locals = MAX_UNROLLED_LOCALS[optimize_for]
+        self._max_unrolled_locals: int = \
+            self.max_unrolled_locals_for_size() \
+            if max_unrolled_locals is None else max_unrolled_locals
+        # the local variables of every function, and of the functions which
+        # call $ZERO_LOCALS
+        self._locals: typing.List[int] = []
+        self._looped_locals: typing.List[int] = []
+        self.stats: typing.Dict[str, int] = {}
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is 
@@ -51,39 +124,57 @@ class CodeWriter:
         output = "@SP\nA=M-1\n"
         return output
 
+    def flush_top(self) -> str:
+        """Returns the code which writes the top of the stack from D to the
+        stack, if it is in D, and forgets that it is there"""
+        if not self._top_in_d:
+            return ""
+        self._top_in_d = False
+        self._flushes += 1
+        return "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+
+    def binary_asm(self, memory_op: str, cached_op: str) -> None:
+        # with the top of the stack (y) in D, x is popped into the operation
+        # and the result stays in D
+        if self._top_in_d:
+            self._output_stream.write("@SP\nAM=M-1\n" + cached_op + "\n")
+        else:
+            self._output_stream.write(self.arithmetic_calc_two_args())
+            self._output_stream.write(memory_op + "\n")
+
+    def unary_asm(self, memory_op: str, cached_op: str) -> None:
+        if self._top_in_d:
+            self._output_stream.write(cached_op + "\n")
+        else:
+            self._output_stream.write(self.arithmetic_calc_one_arg())
+            self._output_stream.write(memory_op + "\n")
+
     def add_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_two_args())
-        self._output_stream.write("M=M+D\n")
+        self.binary_asm("M=M+D", "D=D+M")
 
     def sub_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_two_args())
-        self._output_stream.write("M=M-D\n")
+        self.binary_asm("M=M-D", "D=M-D")
 
     def and_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_two_args())
-        self._output_stream.write("M=M&D\n")
+        self.binary_asm("M=M&D", "D=D&M")
 
     def or_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_two_args())
-        self._output_stream.write("M=M|D\n")
+        self.binary_asm("M=M|D", "D=D|M")
 
     def neg_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_one_arg())
-        self._output_stream.write("M=-M\n")
+        self.unary_asm("M=-M", "D=-D")
 
     def not_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_one_arg())
-        self._output_stream.write("M=!M\n")
+        self.unary_asm("M=!M", "D=!D")
 
     def shiftleft_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_one_arg())
-        self._output_stream.write("M=M<<\n")
+        self.unary_asm("M=M<<", "D=D<<")
 
     def shiftright_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_calc_one_arg())
-        self._output_stream.write("M=M>>\n")
+        self.unary_asm("M=M>>", "D=D>>")
 
-    def arithmetic_comparison_commands(self, jmp_type: str) -> str:
+    def arithmetic_comparison_commands(self, jmp_type: str,
+                                       label_suffix: str) -> str:
         """
         "@SP\n"
         "A=M-1\n"
@@ -97,13 +188,9 @@ class CodeWriter:
         "D=M\n"
         "@SAMESIGN" + str() + "\n"
         "D;JLT\n"
-        "// x>= 0 and y<0 - always true for gt (jump_type JLE), always false for lt (jump_type JGE) \n"
-        "@SP\n"
-        "A=M-1\n"
-        "D=M\n"
-        "@PUSHTRUE" + str() + "\n"
-        "D;" + jump_type + "\n"
-        "@PUSHFALSE" + str() + "\n"
+        "// x>= 0 and y<0 - always true for gt (jump_type JLE), always false for lt (jump_type JGE) and eq (jump_type JNE)\n"
+        "@PUSHTRUE" + str() + "\n"  (gt)
+        "@PUSHFALSE" + str() + "\n"  (lt, eq)
         "0;JMP\n"
 
         "(POSEY" + str() + ")\n"
@@ -147,86 +234,113 @@ class CodeWriter:
         "@SP\n"
         "M=M-1\n"
         """
-        self._current_label_arithmetic += 1
         command: str = ""
         command += "@SP\n"
         command += "A=M-1\n"
         command += "D=M\n"
-        command += "@POSEY" + str(self._current_label_arithmetic) + "\n"
+        command += "@POSEY" + label_suffix + "\n"
         command += "D;JGE\n"
-        command += "(NEGY" + str(self._current_label_arithmetic) + ")\n"
+        command += "(NEGY" + label_suffix + ")\n"
         command += "@SP\n"
         command += "A=M-1\n"
         command += "A=A-1\n"
         command += "D=M\n"
-        command += "@SAMESIGN" + str(self._current_label_arithmetic) + "\n"
+        command += "@SAMESIGN" + label_suffix + "\n"
         command += "D;JLT\n"
-        command += "// x>= 0 and y<0 - always true for gt (jump_type JLE), always false for lt (jump_type JGE) \n"
-        command += "@SP\n"
-        command += "A=M-1\n"
-        command += "D=M\n"
-        command += "@PUSHTRUE" + str(self._current_label_arithmetic) + "\n"
-        command += "D;" + jmp_type + "\n"
-        command += "@PUSHFALSE" + str(self._current_label_arithmetic) + "\n"
+        command += "// x>= 0 and y<0 - always true for gt (jump_type JLE), always false for lt (jump_type JGE) and eq (jump_type JNE)\n"
+        if jmp_type == "JLE":
+            command += "@PUSHTRUE" + label_suffix + "\n"
+        else:
+            command += "@PUSHFALSE" + label_suffix + "\n"
         command += "0;JMP\n"
 
-        command += "(POSEY" + str(self._current_label_arithmetic) + ")\n"
+        command += "(POSEY" + label_suffix + ")\n"
         command += "@SP\n"
         command += "A=M-1\n"
         command += "A=A-1\n"
         command += "D=M\n"
-        command += "@SAMESIGN" + str(self._current_label_arithmetic) + "\n"
+        command += "@SAMESIGN" + label_suffix + "\n"
         command += "D;JGE\n"
         command += "// y>= 0 and x<0 - always false for gt (jump_type JLE), always true for lt (jump_type JGE)\n"
         command += "@SP\n"
         command += "A=M-1\n"
         command += "A=A-1\n"
         command += "D=M\n"
-        command += "@PUSHFALSE" + str(self._current_label_arithmetic) + "\n"
+        command += "@PUSHFALSE" + label_suffix + "\n"
         command += "D;" + jmp_type + "\n"
-        command += "@PUSHTRUE" + str(self._current_label_arithmetic) + "\n"
+        command += "@PUSHTRUE" + label_suffix + "\n"
         command += "0;JMP\n"
 
-        command += "(SAMESIGN" + str(self._current_label_arithmetic) + ")\n"
+        command += "(SAMESIGN" + label_suffix + ")\n"
         command += "@SP\n"
         command += "A=M-1\n"
         command += "D=M\n"
         command += "A=A-1\n"
         command += "D=M-D\n"
-        command += "@PUSHFALSE" + str(self._current_label_arithmetic) + "\n"
+        command += "@PUSHFALSE" + label_suffix + "\n"
         command += "D;" + jmp_type + "\n"
-        command += "(PUSHTRUE" + str(self._current_label_arithmetic) + ")\n"
+        command += "(PUSHTRUE" + label_suffix + ")\n"
         command += "@SP\n"
         command += "D=M-1\n"
         command += "A=D-1\n"
         command += "M=-1\n"
-        command += "@CONTINUE" + str(self._current_label_arithmetic) + "\n"
+        command += "@CONTINUE" + label_suffix + "\n"
         command += "0;JMP\n"
-        command += "(PUSHFALSE" + str(self._current_label_arithmetic) + ")\n"
+        command += "(PUSHFALSE" + label_suffix + ")\n"
         command += "@SP\n"
         command += "D=M-1\n"
         command += "A=D-1\n"
         command += "M=0\n"
-        command += "(CONTINUE" + str(self._current_label_arithmetic) + ")\n"
+        command += "(CONTINUE" + label_suffix + ")\n"
         command += "@SP\n"
         command += "M=M-1\n"
-        output = "@SP\n" + "A=M-1\n" + "D=M\n" + "A=A-1\n" + "D=M-D\n" + "@PUSHFALSE" + str(
-            self._current_label_arithmetic) + "\n" + "D;" + jmp_type + "\n" + "(PUSHTRUE" + str(
-            self._current_label_arithmetic) + ")\n" + "@SP\n" + "D=M-1\n" + "A=D-1\n" + "M=-1\n" + "@CONTINUE" + str(
-            self._current_label_arithmetic) + "\n" + "0;JMP\n" + "(PUSHFALSE" + str(
-            self._current_label_arithmetic) + ")\n" + "@SP\n" + "D=M-1\n" + "A=D-1\n" + "M=0\n" + "(CONTINUE" + str(
-            self._current_label_arithmetic) + ")\n" + "@SP\n" + "M=M-1\n"
-
         return command
 
+    def compare_routine_label(self, command: str) -> str:
+        return "$COMPARE_" + command.upper()
+
+    def compare_call(self, command: str, return_label: str) -> str:
+        output = "@" + return_label + "\n"
+        output += "D=A\n"
+        output += "@" + self.compare_routine_label(command) + "\n"
+        output += "0;JMP\n"
+        output += "(" + return_label + ")\n"
+        return output
+
+    def compare_routine(self, command: str) -> str:
+        """The shared routine of a comparison command, it gets its return
+        address in D and keeps it in R15, which the comparison does not use.
+        """
+        routine_label: str = self.compare_routine_label(command)
+        output = "(" + routine_label + ")\n"
+        output += "@R15\n"
+        output += "M=D\n"
+        output += self.arithmetic_comparison_commands(
+            COMPARISON_JUMPS[command], routine_label)
+        output += "@R15\n"
+        output += "A=M\n"
+        output += "0;JMP\n"
+        return output
+
+    def comparison_asm(self, command: str) -> None:
+        self._current_label_arithmetic += 1
+        self._comparisons[command] = self._comparisons.get(command, 0) + 1
+        self._output_stream.write(self.flush_top())
+        if self._shared_compare:
+            self._output_stream.write(self.compare_call(
+                command, "$COMPARE_RET" + str(self._current_label_arithmetic)))
+        else:
+            self._output_stream.write(self.arithmetic_comparison_commands(
+                COMPARISON_JUMPS[command], str(self._current_label_arithmetic)))
+
     def gt_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_comparison_commands("JLE"))
+        self.comparison_asm("gt")
 
     def lt_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_comparison_commands("JGE"))
+        self.comparison_asm("lt")
 
     def eq_asm(self) -> None:
-        self._output_stream.write(self.arithmetic_comparison_commands("JNE"))
+        self.comparison_asm("eq")
 
 
     def write_arithmetic(self, command: str) -> None:
@@ -249,10 +363,24 @@ class CodeWriter:
         arithmetic_commands[command]()
 
     def push_command(self, segment: str, index: int) -> str:
+        output = self.push_value_commands(segment, index)
+        output += "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+        return output
+
+    def stepped_address(self, segment: str, index: int) -> str:
+        ## A = the address of segment index, without touching D
+        output = "@" + SEGMENT_POINTERS[segment] + "\n"
+        if index == 0:
+            return output + "A=M\n"
+        return output + "A=M+1\n" + "A=A+1\n" * (index - 1)
+
+    def push_value_commands(self, segment: str, index: int) -> str:
+        ## set D to the pushed value
         output = ""
-        labels: dict[str, str] = {"local": "LCL", "this": "THIS",
-                                  "that": "THAT", "argument": "ARG"}
-        if segment in ["local", "this", "that", "argument"]:
+        labels: dict[str, str] = SEGMENT_POINTERS
+        if segment in labels and index <= MAX_STEPPED_PUSH_INDEX:
+            output += self.stepped_address(segment, index)
+        elif segment in ["local", "this", "that", "argument"]:
             output += "@" + str(index) + "\n"
             output += "D=A\n"
             output += "@" + labels[segment] + "\n"
@@ -271,17 +399,41 @@ class CodeWriter:
         else:
             output += "D=M\n"
 
-        output += "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
-
         return output
 
     def pop_command(self, segment: str, index: int) -> str:
-        ## set that R13 will contain the popped value
-        output = "@SP\nM=M-1\n@SP\nA=M\nD=M\n@R13\nM=D\n"
+        if segment in SEGMENT_POINTERS and index > MAX_STEPPED_POP_INDEX:
+            ## R13 = the address of the pop value, then pop into it
+            output = "@" + str(index) + "\n"
+            output += "D=A\n"
+            output += "@" + SEGMENT_POINTERS[segment] + "\n"
+            output += "D=D+M\n"
+            output += "@R13\nM=D\n"
+            output += "@SP\nAM=M-1\nD=M\n"
+            output += "@R13\nA=M\nM=D\n"
+            return output
+        output = "@SP\nAM=M-1\nD=M\n"
+        return output + self.pop_cached_command(segment, index)
+
+    def pop_cached_command(self, segment: str, index: int) -> str:
+        ## the popped value is in D, store it right away unless computing
+        ## the address needs D
+        if segment in SEGMENT_POINTERS and index <= MAX_STEPPED_POP_INDEX:
+            return self.stepped_address(segment, index) + "M=D\n"
+        elif segment == "static":
+            return "@" + self._file_name + "." + str(index) + "\nM=D\n"
+        elif segment == "temp":
+            return "@" + str(index + 5) + "\nM=D\n"
+        elif segment == "pointer":
+            return "@" + str(index + 3) + "\nM=D\n"
+        return self.pop_value_commands(segment, index)
+
+    def pop_value_commands(self, segment: str, index: int) -> str:
+        ## set that R13 will contain the popped value, which is in D
+        output = "@R13\nM=D\n"
 
         ## set so that R14 register will contain the address of the pop value
-        labels: dict[str, str] = {"local": "LCL", "this": "THIS",
-                                  "that": "THAT", "argument": "ARG"}
+        labels: dict[str, str] = SEGMENT_POINTERS
         if segment in ["local", "this", "that", "argument"]:
             output += "@" + str(index) + "\n"
             output += "D=A\n"
@@ -323,11 +475,43 @@ class CodeWriter:
         self._output_stream.write(
             "// " + command + " " + segment + " " + str(index) + "\n")
 
-        if command == "C_PUSH":
+        if command == "C_PUSH" and self._cache_top:
+            self._pushes += 1
+            self._output_stream.write(
+                self.flush_top() + self.push_value_commands(segment, index))
+            self._top_in_d = True
+        elif command == "C_PUSH":
+            self._pushes += 1
             self._output_stream.write(self.push_command(segment, index))
+        elif self._top_in_d:
+            self._top_in_d = False
+            self._output_stream.write(self.pop_cached_command(segment, index))
         else:
             self._output_stream.write(self.pop_command(segment, index))
 
+    def label_symbol(self, label: str) -> str:
+        """Returns the assembly symbol of a VM label of the current function.
+        """
+        return self._file_name + "." + self._function_name + "$" + label
+
+    def new_label_suffix(self) -> str:
+        """Returns a suffix which makes the labels of a piece of generated
+        code unique in the program"""
+        self._current_label_arithmetic += 1
+        return str(self._current_label_arithmetic)
+
+    def write_fused(self, commands: str, asm: str) -> None:
+        """Writes the code of a sequence of VM commands translated together,
+        see Fusion.py. The code expects the whole stack in memory.
+
+        Args:
+            commands (str): the commands, for the comment of the code.
+            asm (str): the code.
+        """
+        self._output_stream.write(self.flush_top())
+        self._output_stream.write("// " + commands + "\n")
+        self._output_stream.write(asm)
+
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command.
         Let "Xxx.foo" be a function within the file Xxx.vm. The handling of
@@ -341,8 +525,9 @@ class CodeWriter:
         """
         # This is irrelevant for project 7,
         # you will implement this in project 8!
+        self._output_stream.write(self.flush_top())
         self._output_stream.write("// label " + label + "\n")
-        command: str = "(" + self._file_name + "." + self._function_name + "$" + label + ")\n"
+        command: str = "(" + self.label_symbol(label) + ")\n"
         self._output_stream.write(command)
 
     def write_goto(self, label: str) -> None:
@@ -353,9 +538,10 @@ class CodeWriter:
         """
         # This is irrelevant for project 7,
         # you will implement this in project 8!
+        self._output_stream.write(self.flush_top())
         self._output_stream.write("// goto " + label + "\n")
         final_command: str = ""
-        final_command += "@" + self._file_name + "." + self._function_name + "$" + label + "\n"
+        final_command += "@" + self.label_symbol(label) + "\n"
         final_command += "0;JMP\n"
         self._output_stream.write(final_command)
 
@@ -369,10 +555,13 @@ class CodeWriter:
         # you will implement this in project 8!
         self._output_stream.write("// if-goto " + label + "\n")
         final_command: str = ""
-        final_command += "@SP\n"
-        final_command += "AM=M-1\n"
-        final_command += "D=M\n"
-        final_command += "@" + self._file_name + "." + self._function_name + "$" + label + "\n"
+        if self._top_in_d:
+            self._top_in_d = False
+        else:
+            final_command += "@SP\n"
+            final_command += "AM=M-1\n"
+            final_command += "D=M\n"
+        final_command += "@" + self.label_symbol(label) + "\n"
         final_command += "D;JNE\n"
         self._output_stream.write(final_command)
 
@@ -394,13 +583,71 @@ class CodeWriter:
         # (function_name)       // injects a function entry label into the code
         # repeat n_vars times:  // n_vars = number of local variables
         #   push constant 0     // initializes the local variables to 0
+        self._output_stream.write(self.flush_top())
         self._function_name = function_name
         self._cur_function_calls = 0
         self._output_stream.write(
             "// function " + function_name + " " + str(n_vars) + "\n")
         self._output_stream.write("(" + function_name + ")\n")
-        for i in range(n_vars):
-            self.write_push_pop("C_PUSH", "constant", 0)
+        self._locals.append(n_vars)
+        if n_vars > self._max_unrolled_locals:
+            self._looped_locals.append(n_vars)
+            self._output_stream.write(self.zero_locals_call(
+                n_vars, "$ZERO_LOCALS_RET" + self.new_label_suffix()))
+        else:
+            self._output_stream.write(self.zero_locals_commands(n_vars))
+
+    def zero_locals_commands(self, n_vars: int) -> str:
+        ## *SP = 0, *(SP+1) = 0, ... stepping A, then SP = A+1 once
+        if n_vars == 0:
+            return ""
+        output = "@SP\nA=M\nM=0\n"
+        output += "A=A+1\nM=0\n" * (n_vars - 1)
+        output += "D=A+1\n@SP\nM=D\n"
+        return output
+
+    def max_unrolled_locals_for_size(self) -> int:
+        """Returns the most local variables which the unrolled stores zero
+        in at most as many words as the call site of $ZERO_LOCALS. The
+        stores are also faster, so they win a tie."""
+        n_vars: int = 0
+        while count_words(self.zero_locals_commands(n_vars + 1)) <= \
+                count_words(self.zero_locals_call(n_vars + 1, "")):
+            n_vars += 1
+        return n_vars
+
+    def zero_locals_call(self, n_vars: int, return_label: str) -> str:
+        # R13 = n_vars, D = return address, goto $ZERO_LOCALS
+        output = "@" + str(n_vars) + "\n"
+        output += "D=A\n"
+        output += "@R13\n"
+        output += "M=D\n"
+        output += "@" + return_label + "\n"
+        output += "D=A\n"
+        output += "@$ZERO_LOCALS\n"
+        output += "0;JMP\n"
+        output += "(" + return_label + ")\n"
+        return output
+
+    def zero_locals_routine(self) -> str:
+        """The shared $ZERO_LOCALS routine, it pushes R13 zeros, R13 > 0,
+        and returns to the address in D, which it keeps in R15."""
+        output = "($ZERO_LOCALS)\n"
+        output += "@R15\n"
+        output += "M=D\n"
+        output += "($ZERO_LOCALS$LOOP)\n"
+        output += "@SP\n"
+        output += "M=M+1\n"
+        output += "A=M-1\n"
+        output += "M=0\n"
+        output += "@R13\n"
+        output += "MD=M-1\n"
+        output += "@$ZERO_LOCALS$LOOP\n"
+        output += "D;JGT\n"
+        output += "@R15\n"
+        output += "A=M\n"
+        output += "0;JMP\n"
+        return output
 
     def write_call(self, function_name: str, n_args: int) -> None:
         """Writes assembly code that affects the call command.
@@ -422,12 +669,25 @@ class CodeWriter:
         # you will implement this in project 8!
         # The pseudo-code of "call function_name n_args" is:
 
+        self._output_stream.write(self.flush_top())
         self._output_stream.write(
             "// call " + function_name + " " + str(n_args) + "\n")
-        # push return_address   // generates a label and pushes it to the stack
         self._cur_function_calls += 1
+        self._calls += 1
         return_address_label: str = self._file_name + "." + self._function_name + "$ret" + str(
             self._cur_function_calls)
+        if self._shared_calls:
+            self._output_stream.write(self.shared_call_commands(
+                function_name, n_args, return_address_label))
+        else:
+            self._output_stream.write(self.call_commands(
+                function_name, n_args, return_address_label))
+        # (return_address)      // injects the return address label into the code
+        self.write_label("ret" + str(self._cur_function_calls))
+
+    def call_commands(self, function_name: str, n_args: int,
+                      return_address_label: str) -> str:
+        # push return_address   // generates a label and pushes it to the stack
         ret_push_command: str = "@" + return_address_label + "\n"
         ret_push_command += "D=A\n"
         ret_push_command += "@SP\n"
@@ -436,12 +696,11 @@ class CodeWriter:
         ret_push_command += "@SP\n"
         ret_push_command += "M=M+1\n"
 
-        self._output_stream.write(ret_push_command)
         # push LCL              // saves LCL of the caller
         # push ARG              // saves ARG of the caller
         # push THIS             // saves THIS of the caller
         # push THAT             // saves THAT of the caller
-        command: str = ""
+        command: str = ret_push_command
         for seg in ["LCL", "ARG", "THIS", "THAT"]:
             command += "    @" + seg + '\n'
             command += ("    D=M\n"
@@ -466,9 +725,58 @@ class CodeWriter:
         # goto function_name    // transfers control to the callee
         command += "@" + function_name + "\n"
         command += "0;JMP\n"
-        self._output_stream.write(command)
-        # (return_address)      // injects the return address label into the code
-        self.write_label("ret" + str(self._cur_function_calls))
+        return command
+
+    def shared_call_commands(self, function_name: str, n_args: int,
+                             return_address_label: str) -> str:
+        # R13 = function_name, R14 = n_args, D = return_address, goto $CALL
+        command: str = "@" + str(n_args) + "\n"
+        command += "D=A\n"
+        command += "@R14\n"
+        command += "M=D\n"
+        command += "@" + function_name + "\n"
+        command += "D=A\n"
+        command += "@R13\n"
+        command += "M=D\n"
+        command += "@" + return_address_label + "\n"
+        command += "D=A\n"
+        command += "@$CALL\n"
+        command += "0;JMP\n"
+        return command
+
+    def call_routine(self) -> str:
+        """The shared $CALL routine, it gets the address of the callee in
+        R13, the number of arguments in R14 and the return address in D, and
+        does what the inline code of call does."""
+        # push return_address
+        command: str = "($CALL)\n"
+        command += "@SP\n"
+        command += "A=M\n"
+        command += "M=D\n"
+        # push LCL, ARG, THIS and THAT, SP always points at the last pushed
+        for seg in ["LCL", "ARG", "THIS", "THAT"]:
+            command += "@" + seg + "\n"
+            command += "D=M\n"
+            command += "@SP\n"
+            command += "AM=M+1\n"
+            command += "M=D\n"
+        # LCL = SP
+        command += "@SP\n"
+        command += "MD=M+1\n"
+        command += "@LCL\n"
+        command += "M=D\n"
+        # ARG = SP-5-n_args
+        command += "@R14\n"
+        command += "D=D-M\n"
+        command += "@5\n"
+        command += "D=D-A\n"
+        command += "@ARG\n"
+        command += "M=D\n"
+        # goto function_name
+        command += "@R13\n"
+        command += "A=M\n"
+        command += "0;JMP\n"
+        return command
 
     def write_return(self) -> None:
         """Writes assembly code that affects the return command."""
@@ -476,9 +784,16 @@ class CodeWriter:
         # you will implement this in project 8!
         # The pseudo-code of "return" is:
 
+        self._output_stream.write(self.flush_top())
         self._output_stream.write(
             "// return from " + self._function_name + "\n")
+        self._returns += 1
+        if self._shared_calls:
+            self._output_stream.write("@$RETURN\n0;JMP\n")
+        else:
+            self._output_stream.write(self.return_commands())
 
+    def return_commands(self) -> str:
         final_command: str = ""
         # frame = LCL                   // frame is a temporary variable stored in R13
         final_command += "@LCL\n"
@@ -540,5 +855,82 @@ class CodeWriter:
         final_command += "@R14\n"
         final_command += "A=M\n"
         final_command += "0;JMP\n"
-
-        self._output_stream.write(final_command)
+        return final_command
+
+    def return_routine(self) -> str:
+        """The shared $RETURN routine, the inline code of return."""
+        return "($RETURN)\n" + self.return_commands()
+
+    def write_init(self) -> None:
+        """Writes the bootstrap code, which sets SP to 256 and calls
+        Sys.init. It must be the first code written."""
+        self._output_stream.write("@256\nD=A\n@SP\nM=D\n")
+        self.write_call("Sys.init", 0)
+
+    def close(self) -> None:
+        """Writes the shared routines the translated code jumps to, behind a
+        loop which stops the program if it runs off the end of its code, and
+        records in stats the ROM words they save and the cycles the calls
+        and returns cost. Must be called once, after all the files of the
+        program are translated."""
+        self._output_stream.write(self.flush_top())
+        comparisons: int = sum(self._comparisons.values())
+        self.stats["comparisons"] = comparisons
+        self.stats["pushes"] = self._pushes
+        if self._cache_top:
+            self.stats["flushes"] = self._flushes
+        self.stats["calls"] = self._calls
+        self.stats["returns"] = self._returns
+        routines: str = ""
+        if self._shared_compare and comparisons:
+            compare_routines: str = ""
+            for command in self._comparisons:
+                compare_routines += "// shared " + command + "\n"
+                compare_routines += self.compare_routine(command)
+            inline_words: int = count_words(
+                self.arithmetic_comparison_commands("JMP", ""))
+            call_words: int = count_words(self.compare_call("eq", ""))
+            self.stats["compare_words_saved"] = (
+                (inline_words - call_words) * comparisons -
+                count_words(compare_routines))
+            routines += compare_routines
+        # calls and returns are straight-line code, each of their words takes
+        # one cycle
+        call_cycles: int = count_words(self.call_commands("f", 0, ""))
+        return_cycles: int = count_words(self.return_commands())
+        if self._shared_calls and (self._calls or self._returns):
+            call_site_words: int = count_words(
+                self.shared_call_commands("f", 0, ""))
+            return_site_words: int = count_words("@$RETURN\n0;JMP\n")
+            call_routines: str = "// shared call\n" + self.call_routine()
+            call_routines += "// shared return\n" + self.return_routine()
+            self.stats["call_words_saved"] = (
+                (call_cycles - call_site_words) * self._calls +
+                (return_cycles - return_site_words) * self._returns -
+                count_words(call_routines))
+            call_cycles = call_site_words + count_words(self.call_routine())
+            return_cycles = return_site_words + count_words(
+                self.return_routine())
+            routines += call_routines
+        if self._locals:
+            # against a push constant 0 for every local variable
+            push_words: int = count_words(self.push_command("constant", 0))
+            locals_words: int = sum(
+                count_words(self.zero_locals_call(n_vars, ""))
+                if n_vars > self._max_unrolled_locals else
+                count_words(self.zero_locals_commands(n_vars))
+                for n_vars in self._locals)
+            if self._looped_locals:
+                zero_routine: str = "// shared local variable zeroing\n" + \
+                    self.zero_locals_routine()
+                locals_words += count_words(zero_routine)
+                routines += zero_routine
+            self.stats["locals"] = sum(self._locals)
+            self.stats["looped_functions"] = len(self._looped_locals)
+            self.stats["locals_words_saved"] = (
+                push_words * sum(self._locals) - locals_words)
+        self.stats["call_cycles"] = call_cycles
+        self.stats["return_cycles"] = return_cycles
+        if routines:
+            self._output_stream.write(
+                "// end of the program\n($END)\n@$END\n0;JMP\n" + routines)
@@ -0,0 +1,232 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import typing
+
+from CodeWriter import CodeWriter
+
+
+class VMCommand(typing.NamedTuple):
+    """A parsed VM command, arg1 and arg2 are "" and 0 where the command has
+    no such argument."""
+    command_type: str
+    arg1: str
+    arg2: int
+
+    def __str__(self) -> str:
+        if self.command_type == "C_ARITHMETIC":
+            return self.arg1
+        if self.command_type == "C_RETURN":
+            return "return"
+        keyword: str = {"C_PUSH": "push", "C_POP": "pop", "C_LABEL": "label",
+                        "C_GOTO": "goto", "C_IF": "if-goto",
+                        "C_FUNCTION": "function",
+                        "C_CALL": "call"}[self.command_type]
+        if self.command_type in ["C_LABEL", "C_GOTO", "C_IF"]:
+            return keyword + " " + self.arg1
+        return keyword + " " + self.arg1 + " " + str(self.arg2)
+
+
+class FusionPattern(typing.NamedTuple):
+    """A sequence of VM commands which is translated as a whole. matches
+    tells whether a window of length commands is the sequence, and template
+    returns the code of the window."""
+    name: str
+    length: int
+    matches: typing.Callable[[typing.Sequence[VMCommand]], bool]
+    template: typing.Callable[[CodeWriter, typing.Sequence[VMCommand]], str]
+
+
+def _is(command: VMCommand, command_type: str,
+        arg1: typing.Optional[str] = None,
+        arg2: typing.Optional[int] = None) -> bool:
+    return command.command_type == command_type and \
+        arg1 in (None, command.arg1) and arg2 in (None, command.arg2)
+
+
+def _push_constant_add(code_writer: CodeWriter,
+                       commands: typing.Sequence[VMCommand]) -> str:
+    if commands[0].arg2 == 1:
+        return "@SP\nA=M-1\nM=M+1\n"
+    return "@" + str(commands[0].arg2) + "\nD=A\n@SP\nA=M-1\nM=D+M\n"
+
+
+def _push_constant_sub(code_writer: CodeWriter,
+                       commands: typing.Sequence[VMCommand]) -> str:
+    if commands[0].arg2 == 1:
+        return "@SP\nA=M-1\nM=M-1\n"
+    return "@" + str(commands[0].arg2) + "\nD=A\n@SP\nA=M-1\nM=M-D\n"
+
+
+def _push_pop(code_writer: CodeWriter,
+              commands: typing.Sequence[VMCommand]) -> str:
+    # the value goes from the source to the target through D, the stack is
+    # not touched
+    push, pop = commands
+    return code_writer.push_value_commands(push.arg1, push.arg2) + \
+        code_writer.pop_cached_command(pop.arg1, pop.arg2)
+
+
+def _compare_if_goto(code_writer: CodeWriter,
+                     commands: typing.Sequence[VMCommand]) -> str:
+    # jumps to the label when the comparison is true, without pushing its
+    # value. x - y can overflow when the signs of x and y differ, so it is
+    # only computed when they are the same, like in the comparison itself
+    comparison, if_goto = commands
+    target: str = code_writer.label_symbol(if_goto.arg1)
+    # pop x and y, A = the address of x
+    output = "@SP\nM=M-1\nAM=M-1\n"
+    if comparison.arg1 == "eq":
+        output += "D=M\nA=A+1\nD=D-M\n@" + target + "\nD;JEQ\n"
+        return output
+    suffix: str = code_writer.new_label_suffix()
+    # where control goes when x >= 0 > y, and when x < 0 <= y
+    x_greater: str = target if comparison.arg1 == "gt" else "CMPEND" + suffix
+    x_less: str = target if comparison.arg1 == "lt" else "CMPEND" + suffix
+    output += "D=M\n"
+    output += "@CMPXNEG" + suffix + "\n"
+    output += "D;JLT\n"
+    output += "@SP\nA=M+1\nD=M\n"
+    output += "@CMPSAMESIGN" + suffix + "\n"
+    output += "D;JGE\n"
+    output += "@" + x_greater + "\n"
+    output += "0;JMP\n"
+    output += "(CMPXNEG" + suffix + ")\n"
+    output += "@SP\nA=M+1\nD=M\n"
+    output += "@CMPSAMESIGN" + suffix + "\n"
+    output += "D;JLT\n"
+    output += "@" + x_less + "\n"
+    output += "0;JMP\n"
+    output += "(CMPSAMESIGN" + suffix + ")\n"
+    output += "@SP\nA=M\nD=M\nA=A+1\nD=D-M\n"
+    output += "@" + target + "\n"
+    output += "D;" + ("JGT" if comparison.arg1 == "gt" else "JLT") + "\n"
+    output += "(CMPEND" + suffix + ")\n"
+    return output
+
+
+def _not_if_goto(code_writer: CodeWriter,
+                 commands: typing.Sequence[VMCommand]) -> str:
+    # !x is not 0 exactly when x is not -1
+    return "@SP\nAM=M-1\nD=M+1\n@" + \
+        code_writer.label_symbol(commands[1].arg1) + "\nD;JNE\n"
+
+
+def _constant_that_access(code_writer: CodeWriter,
+                          commands: typing.Sequence[VMCommand]) -> str:
+    # THAT = k, push *k
+    return "@" + str(commands[0].arg2) + "\nD=A\n@THAT\nM=D\nA=D\nD=M\n" \
+        "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+
+
+def _that_access(code_writer: CodeWriter,
+                 commands: typing.Sequence[VMCommand]) -> str:
+    # THAT = the top of the stack, which is replaced by *THAT
+    return "@SP\nA=M-1\nD=M\n@THAT\nM=D\nA=D\nD=M\n@SP\nA=M-1\nM=D\n"
+
+
+# The patterns, longer ones first, so a window is fused with the longest
+# pattern it starts with.
+PATTERNS: typing.List[FusionPattern] = [
+    FusionPattern(
+        "constant-that-access", 3,
+        lambda commands: _is(commands[0], "C_PUSH", "constant") and
+        _is(commands[1], "C_POP", "pointer", 1) and
+        _is(commands[2], "C_PUSH", "that", 0),
+        _constant_that_access),
+    FusionPattern(
+        "push-constant-add", 2,
+        lambda commands: _is(commands[0], "C_PUSH", "constant") and
+        _is(commands[1], "C_ARITHMETIC", "add"),
+        _push_constant_add),
+    FusionPattern(
+        "push-constant-sub", 2,
+        lambda commands: _is(commands[0], "C_PUSH", "constant") and
+        _is(commands[1], "C_ARITHMETIC", "sub"),
+        _push_constant_sub),
+    FusionPattern(
+        "push-pop", 2,
+        lambda commands: _is(commands[0], "C_PUSH") and
+        _is(commands[1], "C_POP"),
+        _push_pop),
+    FusionPattern(
+        "compare-if-goto", 2,
+        lambda commands: commands[0].command_type == "C_ARITHMETIC" and
+        commands[0].arg1 in ["eq", "gt", "lt"] and _is(commands[1], "C_IF"),
+        _compare_if_goto),
+    FusionPattern(
+        "not-if-goto", 2,
+        lambda commands: _is(commands[0], "C_ARITHMETIC", "not") and
+        _is(commands[1], "C_IF"),
+        _not_if_goto),
+    FusionPattern(
+        "that-access", 2,
+        lambda commands: _is(commands[0], "C_POP", "pointer", 1) and
+        _is(commands[1], "C_PUSH", "that", 0),
+        _that_access),
+]
+
+
+class Fusion:
+    """Sits between the Parser and the CodeWriter. Looks a few commands
+    ahead, translates the sequences of commands which match a pattern with
+    the pattern's template, and hands every other command to the
+    CodeWriter as is."""
+
+    def __init__(self, code_writer: CodeWriter,
+                 patterns: typing.List[FusionPattern] = PATTERNS) -> None:
+        """Initializes the fusion stage.
+
+        Args:
+            code_writer (CodeWriter): writes the fused code.
+            patterns (typing.List[FusionPattern]): the patterns, longer ones
+                first.
+        """
+        self._code_writer: CodeWriter = code_writer
+        self._patterns: typing.List[FusionPattern] = patterns
+        self._window: int = max(pattern.length for pattern in patterns)
+        # the number of times every pattern was fused
+        self.stats: typing.Dict[str, int] = {
+            pattern.name: 0 for pattern in patterns}
+
+    def translate(self, commands: typing.Iterable[VMCommand],
+                  write_command: typing.Callable[[VMCommand], None]) -> None:
+        """Translates the commands of a file.
+
+        Args:
+            commands (typing.Iterable[VMCommand]): the commands.
+            write_command (typing.Callable[[VMCommand], None]): translates a
+                single command which is not fused.
+        """
+        window: typing.Deque[VMCommand] = collections.deque()
+        for command in commands:
+            window.append(command)
+            if len(window) == self._window:
+                self._translate_next(window, write_command)
+        while window:
+            self._translate_next(window, write_command)
+
+    def _translate_next(
+            self, window: typing.Deque[VMCommand],
+            write_command: typing.Callable[[VMCommand], None]) -> None:
+        """Translates the commands the window starts with, fused if they
+        match a pattern, and removes them from the window"""
+        for pattern in self._patterns:
+            if pattern.length > len(window):
+                continue
+            commands: typing.List[VMCommand] = [
+                window[index] for index in range(pattern.length)]
+            if pattern.matches(commands):
+                self.stats[pattern.name] += 1
+                self._code_writer.write_fused(
+                    "; ".join(str(command) for command in commands),
+                    pattern.template(self._code_writer, commands))
+                for _ in range(pattern.length):
+                    window.popleft()
+                return
+        write_command(window.popleft())
@@ -5,68 +5,208 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
 
-from CodeWriter import CodeWriter
+from CallGraph import VMFunction, split_functions, strip_dead_functions
+from CodeWriter import CodeWriter, count_words
+from Fusion import Fusion, VMCommand
 from Parser import Parser
 
 
+def read_commands(parser: Parser) -> typing.Iterator[VMCommand]:
+    """This func yields the commands of a file, as it parses them"""
+    while parser.has_more_commands():
+        parser.advance()
+        if not parser.has_more_commands():
+            break
+        command_type: str = parser.command_type()
+        arg1: str = "" if command_type == "C_RETURN" else parser.arg1()
+        arg2: int = parser.arg2() if command_type in [
+            "C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"] else 0
+        yield VMCommand(command_type, arg1, arg2)
+
+
+def write_command(code_writer: CodeWriter, command: VMCommand) -> None:
+    """This func translates a single command with the code writer"""
+    if command.command_type == "C_ARITHMETIC":
+        code_writer.write_arithmetic(command.arg1)
+    elif command.command_type in ["C_PUSH", "C_POP"]:
+        code_writer.write_push_pop(command.command_type, command.arg1,
+                                   command.arg2)
+    elif command.command_type == "C_LABEL":
+        code_writer.write_label(command.arg1)
+    elif command.command_type == "C_GOTO":
+        code_writer.write_goto(command.arg1)
+    elif command.command_type == "C_IF":
+        code_writer.write_if(command.arg1)
+    elif command.command_type == "C_FUNCTION":
+        code_writer.write_function(command.arg1, command.arg2)
+    elif command.command_type == "C_CALL":
+        code_writer.write_call(command.arg1, command.arg2)
+    elif command.command_type == "C_RETURN":
+        code_writer.write_return()
+
+
 def translate_file(
-        input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        input_file: typing.TextIO, code_writer: CodeWriter,
+        bootstrap: bool, fusion: typing.Optional[Fusion] = None) -> None:
     """Translates a single file.
 
     Args:
         input_file (typing.TextIO): the file to translate.
-        output_file (typing.TextIO): writes all output to this file.
+        code_writer (CodeWriter): writes all output, shared by all the files
+            of the program.
         bootstrap (bool): if this is True, the current file is the 
             first file we are translating.
+        fusion (typing.Optional[Fusion]): if this is given, the commands go
+            through this fusion stage on their way to the code writer.
     """
     # Your code goes here!
     parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
     input_filename, input_extension = os.path.splitext(
         os.path.basename(input_file.name))
-    code_writer.set_file_name(input_filename)
+    translate_commands(read_commands(parser), input_filename, code_writer,
+                       bootstrap, fusion)
+
+
+def translate_commands(
+        commands: typing.Iterable[VMCommand], file_name: str,
+        code_writer: CodeWriter, bootstrap: bool,
+        fusion: typing.Optional[Fusion] = None) -> None:
+    """This func translates commands of the file named file_name, see
+    translate_file"""
+    code_writer.set_file_name(file_name)
     if bootstrap:
-        bootstrap_cmd: str = "@256\nD=A\n@SP\nM=D\n"
-        output_file.write(bootstrap_cmd)
-        code_writer.write_call("Sys.init", 0)
-    while parser.has_more_commands():
-        parser.advance()
-        if not parser.has_more_commands():
-            break
-        if parser.command_type() == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
-        elif parser.command_type() in ["C_PUSH", "C_POP"]:
-            code_writer.write_push_pop(parser.command_type(), parser.arg1(),
-                                       parser.arg2())
-        elif parser.command_type() == "C_LABEL":
-            code_writer.write_label(parser.arg1())
-        elif parser.command_type() == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
-        elif parser.command_type() == "C_IF":
-            code_writer.write_if(parser.arg1())
-        elif parser.command_type() == "C_FUNCTION":
-            code_writer.write_function(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_CALL":
-            code_writer.write_call(parser.arg1(), parser.arg2())
-        elif parser.command_type() == "C_RETURN":
-            code_writer.write_return()
+        code_writer.write_init()
+    if fusion is not None:
+        fusion.translate(commands,
+                         lambda command: write_command(code_writer, command))
+        return
+    for command in commands:
+        write_command(code_writer, command)
+
 
+def translate_program(
+        input_paths: typing.List[str], code_writer: CodeWriter,
+        fusion: typing.Optional[Fusion] = None,
+        make_code_writer: typing.Optional[
+            typing.Callable[[typing.TextIO], CodeWriter]] = None
+) -> typing.Tuple[typing.List[VMFunction], int]:
+    """This func translates a program in two phases. All its files are
+    parsed first, then only the functions Sys.init can call are translated,
+    see CallGraph.strip_dead_functions. Returns the dead functions, and the
+    ROM words they would have taken, measured by translating them with a
+    code writer from make_code_writer into a scratch buffer"""
+    functions: typing.List[VMFunction] = []
+    for input_path in input_paths:
+        with open(input_path, 'r') as input_file:
+            input_filename, input_extension = os.path.splitext(
+                os.path.basename(input_file.name))
+            functions.extend(split_functions(
+                input_filename, read_commands(Parser(input_file))))
+    kept, dead = strip_dead_functions(functions)
+    bootstrap = True
+    for function in kept:
+        translate_commands(function.commands, function.file_name,
+                           code_writer, bootstrap, fusion)
+        bootstrap = False
+    dead_words: int = 0
+    if dead and make_code_writer is not None:
+        scratch = io.StringIO()
+        scratch_writer: CodeWriter = make_code_writer(scratch)
+        for function in dead:
+            translate_commands(
+                function.commands, function.file_name, scratch_writer, False,
+                Fusion(scratch_writer) if fusion is not None else None)
+        dead_words = count_words(scratch.getvalue())
+    return dead, dead_words
 
 
-if "__main__" == __name__:
+def format_stats(stats: typing.Dict[str, int],
+                 fusion_stats: typing.Optional[typing.Dict[str, int]] = None
+                 ) -> str:
+    """This func formats the counters of a translation as a one line report"""
+    report: str = "%d comparisons" % stats["comparisons"]
+    if "compare_words_saved" in stats:
+        report += ", shared compare routines saved %d ROM words" % stats[
+            "compare_words_saved"]
+    if "flushes" in stats:
+        report += ", %d of %d pushes kept in D instead of on the stack" % (
+            stats["pushes"] - stats["flushes"], stats["pushes"])
+    if "locals" in stats:
+        report += ", %d local variables zeroed (%d functions by the shared " \
+                  "loop), saving %d ROM words" % (
+                      stats["locals"], stats["looped_functions"],
+                      stats["locals_words_saved"])
+    report += ", %d calls (%d cycles each), %d returns (%d cycles each)" % (
+        stats["calls"], stats["call_cycles"], stats["returns"],
+        stats["return_cycles"])
+    if "dead_functions" in stats:
+        report += ", dropped %d unreachable functions, saving %d ROM " \
+                  "words" % (stats["dead_functions"], stats["dead_words"])
+    if "call_words_saved" in stats:
+        report += ", shared call/return routines saved %d ROM words" % stats[
+            "call_words_saved"]
+    if fusion_stats is not None:
+        report += ", fused %d sequences (%s)" % (
+            sum(fusion_stats.values()), ", ".join(
+                "%s %d" % (name, hits) for name, hits in fusion_stats.items()))
+    return report
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    """This func runs the translator command line, argv defaults to the
+    arguments of the process. Returns the exit code"""
     # Parses the input path and calls translate_file on each input file.
     # This opens both the input and the output files!
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    # With --shared-compare, eq, gt and lt call one routine per command.
+    # With --shared-calls, call and return jump to the $CALL and $RETURN
+    # routines.
+    # With --cache-top, the top of the stack is kept in D between commands.
+    # With --fuse, common sequences of commands are translated as a whole.
+    # With --optimize-for size, shorter code is chosen over faster code.
+    # With --strip-dead-functions, the functions Sys.init can not call are
+    # not translated.
+    # With --stats, counters of the translation are reported.
+    arg_parser = argparse.ArgumentParser(prog="VMtranslator")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--shared-compare", action="store_true",
+        help="translate eq, gt and lt into calls of a routine shared by all "
+             "the comparisons of the same kind, instead of inlining them")
+    arg_parser.add_argument(
+        "--shared-calls", action="store_true",
+        help="translate call and return into jumps to the shared $CALL and "
+             "$RETURN routines, instead of inlining them")
+    arg_parser.add_argument(
+        "--cache-top", action="store_true",
+        help="keep the value on top of the stack in D, writing it to the "
+             "stack only when D is needed or at labels, jumps and calls")
+    arg_parser.add_argument(
+        "--fuse", action="store_true",
+        help="translate common sequences of commands as a whole, with "
+             "hand-optimised code")
+    arg_parser.add_argument(
+        "--optimize-for", choices=["speed", "size"], default="speed",
+        help="where faster and shorter code differ, choose the faster (the "
+             "default) or the shorter, this decides which functions zero "
+             "their local variables with the shared loop")
+    arg_parser.add_argument(
+        "--strip-dead-functions", action="store_true",
+        help="parse all the files first and only translate the functions "
+             "which Sys.init can call, directly or not")
+    arg_parser.add_argument(
+        "--stats", action="store_true",
+        help="report statistics of the translation")
+    args = arg_parser.parse_args(argv)
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -77,12 +217,44 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
+
+    def make_code_writer(output_file: typing.TextIO) -> CodeWriter:
+        return CodeWriter(output_file, shared_compare=args.shared_compare,
+                          shared_calls=args.shared_calls,
+                          cache_top=args.cache_top,
+                          optimize_for=args.optimize_for)
+
+    dead: typing.List[VMFunction] = []
     bootstrap = True
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        code_writer = make_code_writer(output_file)
+        fusion: typing.Optional[Fusion] = (
+            Fusion(code_writer) if args.fuse else None)
+        if args.strip_dead_functions:
+            dead, dead_words = translate_program(
+                files_to_translate, code_writer, fusion,
+                make_code_writer if args.stats else None)
+            code_writer.stats["dead_functions"] = len(dead)
+            code_writer.stats["dead_words"] = dead_words
+        else:
+            for input_path in files_to_translate:
+                with open(input_path, 'r') as input_file:
+                    translate_file(input_file, code_writer, bootstrap, fusion)
+                bootstrap = False
+        code_writer.close()
+    if args.stats:
+        print("%s: %s" % (output_path, format_stats(
+            code_writer.stats, fusion.stats if fusion else None)),
+            file=sys.stderr)
+        if dead:
+            print("%s: dropped %s" % (output_path, ", ".join(
+                function.name or function.file_name for function in dead)),
+                file=sys.stderr)
+    return 0
+
+
+if "__main__" == __name__:
+    sys.exit(main())
@@ -53,10 +53,11 @@ class Parser:
             input_file (typing.TextIO): input file.
         """
         # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        self.input_lines = input_file.read().splitlines()
-        self._num_lines: int = len(self.input_lines)
-        self._cur_line: int = -1
+        # The input is consumed one line at a time as advance() is called,
+        # so the whole file is never held in memory.
+        self._input_file: typing.TextIO = input_file
+        self._cur_command: str = ""
+        self._exhausted: bool = False
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -64,7 +65,7 @@ class Parser:
         Returns:
             bool: True if there are more commands, False otherwise.
         """
-        return self._cur_line <= self._num_lines - 1
+        return not self._exhausted
 
     def valid_command(self, command: str) -> bool:
         """this func receive a string command and return true if it does not
@@ -81,10 +82,11 @@ class Parser:
         command. Should be called only if has_more_commands() is true. Initially
         there is no current command.
         """
-        self._cur_line += 1  # advance the cur_line index
-        while self.has_more_commands() and not self.valid_command(
-                self.input_lines[self._cur_line]):
-            self._cur_line += 1
+        for line in self._input_file:
+            if self.valid_command(line):
+                self._cur_command = line
+                return
+        self._exhausted = True
 
     def command_type(self) -> str:
         """
@@ -148,6 +150,6 @@ class Parser:
         return int(parms[2])
 
     def clean_command(self) -> str:
-        line = self.input_lines[self._cur_line]
+        line = self._cur_command
         # remove inline comments
         return ' '.join(line.split("//")[0].split())
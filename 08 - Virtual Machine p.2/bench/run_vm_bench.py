@@ -0,0 +1,122 @@
+"""
+Documents the cost of the push and pop commands of the VM translator. For
+every segment and index, the Hack instructions the CodeWriter emits for
+push, for pop, and for pop with the top of the stack already in D
+(--cache-top) are counted. These sequences have no jumps, so every
+instruction is also one cycle. The push and pop commands of a corpus of .vm
+files are then counted by segment and index, which shows where the words of
+a compiled program go. The results are printed (or written with --output)
+as JSON, so they can be compared between releases.
+
+Usage:
+    python3 bench/run_vm_bench.py --max-index 10 --corpus ../12*/tests/PongTest
+"""
+import argparse
+import collections
+import io
+import json
+import os
+import platform
+import sys
+import typing
+
+TRANSLATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TRANSLATOR_DIR)
+
+from CodeWriter import CodeWriter, count_words
+from Main import read_commands
+from Parser import Parser
+
+SEGMENTS = ["constant", "local", "argument", "this", "that", "static", "temp",
+            "pointer"]
+# the number of registers of the fixed segments
+SEGMENT_SIZES = {"temp": 8, "pointer": 2}
+DEFAULT_CORPUS = os.path.join(os.path.dirname(TRANSLATOR_DIR),
+                              "12 - The Operating System", "tests",
+                              "PongTest")
+
+
+def command_costs(segment: str, index: int) -> typing.Dict[str, int]:
+    """Returns the instructions of push, pop and pop from D of segment index,
+    pop is left out for the constant segment"""
+    code_writer = CodeWriter(io.StringIO())
+    code_writer.set_file_name("Bench")
+    costs = {"push": count_words(code_writer.push_command(segment, index))}
+    if segment != "constant":
+        costs["pop"] = count_words(code_writer.pop_command(segment, index))
+        costs["pop_from_d"] = count_words(
+            code_writer.pop_cached_command(segment, index))
+    return costs
+
+
+def count_corpus(vm_paths: typing.List[str]
+                 ) -> typing.Dict[typing.Tuple[str, str, int], int]:
+    """Counts the push and pop commands of the given .vm files by command,
+    segment and index"""
+    counts: typing.Counter = collections.Counter()
+    for vm_path in vm_paths:
+        with open(vm_path, 'r') as vm_file:
+            for command in read_commands(Parser(vm_file)):
+                if command.command_type in ["C_PUSH", "C_POP"]:
+                    counts[(command.command_type[2:].lower(), command.arg1,
+                            command.arg2)] += 1
+    return counts
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(prog="run_vm_bench")
+    arg_parser.add_argument(
+        "--max-index", type=int, default=10,
+        help="document the indices 0 to this one of every segment")
+    arg_parser.add_argument(
+        "--corpus", nargs="*", default=[DEFAULT_CORPUS], metavar="PATH",
+        help=".vm files, or directories of them, to count the push and pop "
+             "commands of, the PongTest build by default")
+    arg_parser.add_argument(
+        "--output", metavar="FILE",
+        help="write the JSON results to FILE instead of stdout")
+    args = arg_parser.parse_args()
+
+    costs = {
+        segment: {
+            str(index): command_costs(segment, index)
+            for index in range(min(args.max_index + 1,
+                                   SEGMENT_SIZES.get(segment, 32768)))}
+        for segment in SEGMENTS}
+
+    vm_paths: typing.List[str] = []
+    for path in args.corpus:
+        if os.path.isdir(path):
+            vm_paths.extend(sorted(
+                os.path.join(path, filename) for filename in os.listdir(path)
+                if os.path.splitext(filename)[1].lower() == ".vm"))
+        else:
+            vm_paths.append(path)
+    corpus: typing.Dict[str, typing.Any] = {}
+    for (command, segment, index), count in sorted(
+            count_corpus(vm_paths).items(), key=lambda item: -item[1]):
+        words = command_costs(segment, index)[command]
+        entry = corpus.setdefault(command, {"commands": 0, "words": 0,
+                                            "by_segment_and_index": []})
+        entry["commands"] += count
+        entry["words"] += count * words
+        entry["by_segment_and_index"].append(
+            {"segment": segment, "index": index, "count": count,
+             "words_each": words, "words": count * words})
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"max_index": args.max_index, "corpus": vm_paths},
+        "instructions_per_command": costs,
+        "corpus": corpus}
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if "__main__" == __name__:
+    main()
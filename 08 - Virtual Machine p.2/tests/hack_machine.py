@@ -0,0 +1,139 @@
+"""
+A small Hack computer for the tests, which runs the assembly the translator
+writes directly, without assembling it first. Labels, predefined symbols and
+variables are resolved like the assembler does, and every comp is evaluated
+with the semantics of the Hack ALU, including the extended shifts.
+"""
+import io
+import os
+import sys
+import typing
+
+TRANSLATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TRANSLATOR_DIR)
+
+from CodeWriter import CodeWriter
+from Fusion import Fusion
+from Main import read_commands, translate_commands
+from Parser import Parser
+
+PREDEFINED: typing.Dict[str, int] = dict(
+    {"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4, "SCREEN": 16384,
+     "KBD": 24576}, **{"R%d" % register: register for register in range(16)})
+
+JUMPS: typing.Dict[str, typing.Callable[[int], bool]] = {
+    "null": lambda out: False, "JGT": lambda out: out > 0,
+    "JEQ": lambda out: out == 0, "JGE": lambda out: out >= 0,
+    "JLT": lambda out: out < 0, "JNE": lambda out: out != 0,
+    "JLE": lambda out: out <= 0, "JMP": lambda out: True}
+
+
+def _signed(value: int) -> int:
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _compile_comp(comp: str) -> typing.Callable[[int, int, int], int]:
+    """Returns a function of A, D and M which computes comp, signed"""
+    expression: str = comp.replace("!", "~").lower()
+    if expression.endswith("<<"):
+        expression = "(%s) << 1" % expression[:-2]
+    elif expression.endswith(">>"):
+        expression = "(%s) >> 1" % expression[:-2]
+    function = eval("lambda a, d, m: " + expression)
+    return lambda a, d, m: _signed(function(a, d, m))
+
+
+def load(asm: str) -> typing.List[typing.Tuple]:
+    """Resolves the symbols of a program and decodes its commands into
+    ("A", value) and ("C", dest, comp function, jump) tuples"""
+    commands: typing.List[str] = []
+    symbols: typing.Dict[str, int] = dict(PREDEFINED)
+    for line in asm.split("\n"):
+        line = line.split("//")[0].strip()
+        if line.startswith("("):
+            symbols.setdefault(line[1:-1], len(commands))
+        elif line:
+            commands.append(line)
+    next_variable: int = 16
+    rom: typing.List[typing.Tuple] = []
+    for command in commands:
+        if command.startswith("@"):
+            symbol: str = command[1:]
+            if not symbol.isdigit() and symbol not in symbols:
+                symbols[symbol] = next_variable
+                next_variable += 1
+            rom.append(("A", int(symbol) if symbol.isdigit()
+                        else symbols[symbol]))
+            continue
+        dest, _, rest = command.rpartition("=")
+        comp, _, jump = rest.partition(";")
+        rom.append(("C", dest, _compile_comp(comp), jump or "null"))
+    return rom
+
+
+def run(asm: str, max_cycles: int = 1000000) -> typing.List[int]:
+    """Runs a program until it reaches a halt loop, an A-command which loads
+    its own address followed by 0;JMP, and returns the RAM, signed. Raises
+    RuntimeError if it runs for max_cycles without halting."""
+    rom = load(asm)
+    ram: typing.List[int] = [0] * 32768
+    a = d = pc = 0
+    for _ in range(max_cycles):
+        if pc >= len(rom):
+            raise RuntimeError("the program ran off the end of the ROM")
+        command = rom[pc]
+        if command[0] == "A":
+            a = command[1]
+            pc += 1
+            continue
+        kind, dest, comp, jump = command
+        out: int = comp(a, d, ram[a & 0x7FFF])
+        target: int = a
+        if "M" in dest:
+            ram[a & 0x7FFF] = out
+        if "A" in dest:
+            a = out
+        if "D" in dest:
+            d = out
+        if JUMPS[jump](out):
+            if target == pc - 1 and jump == "JMP" and \
+                    rom[target] == ("A", target):
+                return ram
+            pc = target & 0x7FFF
+        else:
+            pc += 1
+    raise RuntimeError("the program did not halt in %d cycles" % max_cycles)
+
+
+def translate(files: typing.Dict[str, str], fuse: bool = False,
+              **options: typing.Any) -> typing.Tuple[str, CodeWriter,
+                                                     typing.Optional[Fusion]]:
+    """Translates a program given as the sources of its .vm files by name,
+    with the bootstrap code, and returns its assembly together with the
+    code writer and the fusion stage, to read their statistics"""
+    output = io.StringIO()
+    code_writer = CodeWriter(output, **options)
+    fusion: typing.Optional[Fusion] = Fusion(code_writer) if fuse else None
+    bootstrap: bool = True
+    for file_name, source in files.items():
+        translate_commands(read_commands(Parser(io.StringIO(source))),
+                           file_name, code_writer, bootstrap, fusion)
+        bootstrap = False
+    code_writer.close()
+    return output.getvalue(), code_writer, fusion
+
+
+def run_program(files: typing.Dict[str, str], fuse: bool = False,
+                **options: typing.Any) -> typing.List[int]:
+    """Translates a program, see translate, and runs it, see run"""
+    return run(translate(files, fuse, **options)[0])
+
+
+def observable(ram: typing.List[int]) -> typing.Dict[str, typing.List[int]]:
+    """Returns the parts of the RAM a VM program can observe: the segment
+    pointers, temp, the static variables, the stack up to SP and the heap.
+    The registers R13-R15 and the memory above SP are scratch space, where
+    translations may differ."""
+    return {"pointers": ram[0:5], "temp": ram[5:13], "static": ram[16:256],
+            "stack": ram[256:ram[0]], "heap": ram[2048:4096]}
@@ -0,0 +1,184 @@
+"""
+Tests of the CodeWriter of the VM translator.
+"""
+import io
+import os
+import sys
+import typing
+import unittest
+
+TRANSLATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TRANSLATOR_DIR)
+
+from CodeWriter import MAX_UNROLLED_LOCALS, CodeWriter, count_words
+import hack_machine
+
+# operands of opposite signs, and of equal signs where x - y overflows
+COMPARISON_OPERANDS = [(1, -1), (-1, 1), (0, -1), (-1, 0), (32767, -32768),
+                       (-32768, 32767), (32767, -1), (-32768, 1), (5, 5),
+                       (-7, -7), (-32768, -32768), (3, 4), (-4, -3)]
+
+
+def push_constant(value: int) -> str:
+    """Returns VM commands which push any 16-bit value"""
+    if value == -32768:
+        return "push constant 32767\nneg\npush constant 1\nsub\n"
+    if value < 0:
+        return "push constant %d\nneg\n" % -value
+    return "push constant %d\n" % value
+
+
+def sys_init(body: str, n_vars: int = 0) -> typing.Dict[str, str]:
+    """Returns a program whose Sys.init, with n_vars local variables, runs
+    body and then halts"""
+    return {"Sys": "function Sys.init %d\n" % n_vars + body +
+                   "label HALT\ngoto HALT\n"}
+
+
+def _zeroing_words(code_writer: CodeWriter, n_vars: int) -> int:
+    """Returns the words write_function zeroes n_vars local variables with"""
+    output = io.StringIO()
+    code_writer._output_stream = output
+    code_writer.write_function("Test.f", n_vars)
+    return count_words(output.getvalue())
+
+
+class ZeroLocalsTest(unittest.TestCase):
+
+    def test_size_never_calls_when_unrolled_is_as_short(self) -> None:
+        code_writer = CodeWriter(io.StringIO(), optimize_for="size")
+        for n_vars in range(1, 64):
+            unrolled = count_words(code_writer.zero_locals_commands(n_vars))
+            call = count_words(code_writer.zero_locals_call(n_vars, "RET"))
+            words = _zeroing_words(code_writer, n_vars)
+            if n_vars > code_writer._max_unrolled_locals:
+                self.assertLess(call, unrolled, n_vars)
+                self.assertEqual(words, call, n_vars)
+            else:
+                self.assertLessEqual(unrolled, call, n_vars)
+                self.assertEqual(words, unrolled, n_vars)
+
+    def test_speed_limit(self) -> None:
+        code_writer = CodeWriter(io.StringIO(), optimize_for="speed")
+        self.assertEqual(code_writer._max_unrolled_locals,
+                         MAX_UNROLLED_LOCALS["speed"])
+
+
+class ComparisonTest(unittest.TestCase):
+
+    def test_opposite_signs(self) -> None:
+        body: str = ""
+        expected: typing.List[int] = []
+        for x, y in COMPARISON_OPERANDS:
+            for command, result in [("eq", x == y), ("gt", x > y),
+                                    ("lt", x < y)]:
+                body += push_constant(x) + push_constant(y) + command + \
+                    "\npop static %d\n" % len(expected)
+                expected.append(-1 if result else 0)
+        for shared_compare in [False, True]:
+            ram = hack_machine.run_program(sys_init(body),
+                                           shared_compare=shared_compare)
+            self.assertEqual(ram[16:16 + len(expected)], expected,
+                             "shared_compare=%s" % shared_compare)
+
+
+# Values stay cached in D across arithmetic, pops and if-gotos, and have to
+# be flushed before labels, gotos, calls and returns.
+CACHE_TOP_PROGRAM: typing.Dict[str, str] = {
+    "Sys": """function Sys.init 2
+push constant 7
+push constant 5
+sub
+pop local 0
+push local 0
+push constant 2
+call Test.double 1
+add
+pop static 0
+push constant 9
+label LOOP
+push local 0
+push constant 1
+sub
+pop local 0
+push local 0
+if-goto LOOP
+pop static 1
+push constant 5
+neg
+not
+pop temp 3
+push constant 2048
+pop pointer 1
+push constant 42
+pop that 2
+push that 2
+push constant 42
+eq
+pop static 2
+push constant 17
+push constant 4
+gt
+not
+pop static 3
+push constant 6
+push constant 7
+call Test.sum 2
+push constant 3
+call Test.double 1
+sub
+pop static 4
+push constant 1
+push constant 2
+and
+push constant 4
+or
+push static 4
+push constant 1
+lt
+push constant 13
+goto NEXT
+label NEXT
+pop static 5
+push constant 11
+label HALT
+goto HALT
+""",
+    "Test": """function Test.double 0
+push argument 0
+push argument 0
+add
+return
+function Test.sum 1
+push argument 0
+pop local 0
+push local 0
+push argument 1
+add
+return
+"""}
+
+
+class CacheTopTest(unittest.TestCase):
+
+    def test_same_results_as_the_stack(self) -> None:
+        for options in [{}, {"shared_compare": True},
+                        {"shared_calls": True},
+                        {"shared_compare": True, "shared_calls": True}]:
+            expected = hack_machine.run_program(CACHE_TOP_PROGRAM, **options)
+            self.assertEqual(expected[16:22], [6, 9, -1, 0, 7, 13])
+            self.assertEqual(expected[8], 4)
+            ram = hack_machine.run_program(CACHE_TOP_PROGRAM, cache_top=True,
+                                           **options)
+            self.assertEqual(hack_machine.observable(ram),
+                             hack_machine.observable(expected), options)
+
+    def test_pushes_kept_in_d(self) -> None:
+        asm, code_writer, fusion = hack_machine.translate(
+            CACHE_TOP_PROGRAM, cache_top=True)
+        self.assertLess(code_writer.stats["flushes"],
+                        code_writer.stats["pushes"])
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests of the fusion stage of the VM translator. Every pattern is translated
+with and without fusion, and both programs must leave the same RAM.
+"""
+import typing
+import unittest
+
+import hack_machine
+from Fusion import PATTERNS
+from test_code_writer import COMPARISON_OPERANDS, push_constant, sys_init
+
+
+def _compare_if_goto_body() -> str:
+    body: str = ""
+    for index, (x, y) in enumerate(COMPARISON_OPERANDS):
+        for command in ["eq", "gt", "lt"]:
+            label: str = "%s%d" % (command.upper(), index)
+            static: int = len(body.split("if-goto")) - 1
+            body += push_constant(x) + push_constant(y) + command + "\n"
+            body += "if-goto TRUE_%s\n" % label
+            body += "push constant 0\npop static %d\n" % static
+            body += "goto END_%s\n" % label
+            body += "label TRUE_%s\n" % label
+            body += "push constant 1\npop static %d\n" % static
+            body += "label END_%s\n" % label
+    return body
+
+
+def _not_if_goto_body() -> str:
+    body: str = ""
+    for index, value in enumerate([0, -1, 1, 5, -32768]):
+        body += push_constant(value) + "not\n"
+        body += "if-goto TRUE%d\n" % index
+        body += "push constant 0\npop static %d\n" % index
+        body += "goto END%d\n" % index
+        body += "label TRUE%d\n" % index
+        body += "push constant 1\npop static %d\n" % index
+        body += "label END%d\n" % index
+    return body
+
+
+# A program for every pattern, and the number of times it is fused there.
+PATTERN_PROGRAMS: typing.Dict[str, typing.Tuple[str, int]] = {
+    "constant-that-access": (
+        "push constant 2048\npop pointer 1\npush constant 77\npop that 0\n"
+        "push constant 2049\npop pointer 1\npush constant 78\npop that 0\n"
+        "push constant 2048\npop pointer 1\npush that 0\npop static 0\n"
+        "push constant 2049\npop pointer 1\npush that 0\npop static 1\n", 2),
+    "push-constant-add": (
+        "push constant 5\npush constant 1\nadd\npop static 0\n" +
+        push_constant(-1) + "push constant 1\nadd\npop static 1\n" +
+        push_constant(-32768) + "push constant 300\nadd\npop static 2\n" +
+        "push constant 32767\npush constant 1\nadd\npop static 3\n", 4),
+    "push-constant-sub": (
+        "push constant 5\npush constant 1\nsub\npop static 0\n" +
+        push_constant(-32768) + "push constant 1\nsub\npop static 1\n" +
+        push_constant(-20) + "push constant 300\nsub\npop static 2\n",
+        # and once more within push_constant(-32768)
+        4),
+    "push-pop": (
+        # argument 0 of Sys.init is the return address of its frame, which
+        # is never used
+        "push constant 3\npop local 0\npush local 0\npop static 0\n"
+        "push static 0\npop temp 2\npush temp 2\npop local 1\n"
+        "push constant 2048\npop pointer 0\npush local 1\npop this 3\n"
+        "push this 3\npop argument 0\npush argument 0\npop static 1\n"
+        "push constant 2060\npop pointer 1\npush static 1\npop that 0\n", 10),
+    "compare-if-goto": (_compare_if_goto_body(),
+                        3 * len(COMPARISON_OPERANDS)),
+    "not-if-goto": (_not_if_goto_body(), 5),
+    "that-access": (
+        "push constant 2050\npush constant 66\npop temp 0\npop pointer 1\n"
+        "push temp 0\npop that 0\n"
+        "push constant 2048\npush constant 2\nadd\npop pointer 1\n"
+        "push that 0\npop static 0\n"
+        "push constant 2050\npush static 0\nadd\npop pointer 1\n"
+        "push that 0\npop static 1\n", 2),
+}
+
+
+class FusionTest(unittest.TestCase):
+
+    def test_every_pattern_is_tested(self) -> None:
+        self.assertEqual(set(PATTERN_PROGRAMS),
+                         {pattern.name for pattern in PATTERNS})
+
+    def test_same_results_as_unfused(self) -> None:
+        for name, (body, fused) in PATTERN_PROGRAMS.items():
+            program = sys_init(body, 2)
+            for options in [{}, {"cache_top": True},
+                            {"shared_compare": True}]:
+                expected = hack_machine.run_program(program, **options)
+                asm, code_writer, fusion = hack_machine.translate(
+                    program, fuse=True, **options)
+                self.assertEqual(fusion.stats[name], fused, name)
+                self.assertEqual(
+                    hack_machine.observable(hack_machine.run(asm)),
+                    hack_machine.observable(expected), (name, options))
+
+    def test_compare_if_goto_results(self) -> None:
+        ram = hack_machine.run_program(
+            sys_init(_compare_if_goto_body()), fuse=True)
+        expected: typing.List[int] = []
+        for x, y in COMPARISON_OPERANDS:
+            expected += [int(x == y), int(x > y), int(x < y)]
+        self.assertEqual(ram[16:16 + len(expected)], expected)
+
+
+if "__main__" == __name__:
+    unittest.main()